@@ -0,0 +1,65 @@
+"""
+Benchmark: filtro por rango de fechas con máscara booleana vs SerieTemporal.
+
+Genera datos intradía (intervalos de 15 minutos) y compara el filtro actual
+``df[(df['fecha'] >= ini) & (df['fecha'] <= fin)]`` con el corte por
+búsqueda binaria de ``SerieTemporal.rango``.
+
+Uso:
+    python benchmarks/bench_serie_temporal.py [filas]
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from kpis.serie import SerieTemporal, fin_exclusivo
+
+REPETICIONES = 20
+
+
+def generar_intradia(filas):
+    """DataFrame con ``filas`` intervalos de 15 minutos"""
+    rng = np.random.default_rng(42)
+    return pd.DataFrame({
+        'fecha': pd.date_range('2000-01-01', periods=filas, freq='15min'),
+        'nivel_servicio': rng.uniform(85, 98, filas),
+        'llamadas_totales': rng.integers(0, 30, filas),
+        'tmo': rng.uniform(3, 8, filas),
+    })
+
+
+def main():
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    df = generar_intradia(filas)
+    serie = SerieTemporal(df)
+
+    # Ventana de 30 días en mitad de la serie (la vista por defecto)
+    ini = df['fecha'].iloc[filas // 2].normalize()
+    fin = ini + pd.Timedelta(days=29)
+
+    def con_mascara():
+        return df[(df['fecha'] >= ini) & (df['fecha'] < fin_exclusivo(fin))]
+
+    def con_indice():
+        return serie.rango(ini, fin)
+
+    assert con_mascara()['fecha'].equals(con_indice()['fecha'])
+
+    t_mascara = min(timeit.repeat(con_mascara, number=1, repeat=REPETICIONES))
+    t_indice = min(timeit.repeat(con_indice, number=1, repeat=REPETICIONES))
+
+    print(f"Filas: {filas:,} | Ventana: {ini.date()} - {fin.date()} "
+          f"({len(con_indice()):,} filas)")
+    print(f"Máscara booleana : {t_mascara * 1000:8.3f} ms")
+    print(f"SerieTemporal    : {t_indice * 1000:8.3f} ms")
+    print(f"Aceleración      : {t_mascara / t_indice:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,28 @@
 # dashboard.py
+import os
 import streamlit as st
 import pandas as pd
 import plotly.express as px
 import seaborn as sns
 import matplotlib.pyplot as plt
-import numpy as np
 from datetime import datetime, timedelta
 
+from kpis.almacen import AlmacenKPI
+from kpis.cache import CacheConsultas
+from kpis.componentes import COMPONENTES, combinar
+from kpis.dimensiones import DIMENSIONES, TODOS, IndiceDimensiones
+from kpis.figuras import CacheFiguras
+from kpis.generador import escribir_en_almacen, generar_agentes
+from kpis.intervalos import RUTA_INTERVALOS, perfil_intradia
+from kpis.registro import REGISTRO
+from kpis.serie import SerieTemporal
+from kpis.submuestreo import submuestrear
+from kpis.acumulados import COMPARACIONES, AcumuladosKPI, inicio_comparaciones
+from kpis.agentes import COLUMNAS_RANKING, kpis_por_agente, seleccionar_extremos
+from kpis.agregados import GRANULARIDADES, AgregadosKPI
+from etl.metricas import leer_metricas
+from etl.rollups import Rollups
+
 # ========================================
 # CONFIGURACIÓN DE LA PÁGINA
 # ========================================
@@ -43,71 +59,298 @@ def check_login():
 if not check_login():
     st.stop()
 
+# ========================================
+# SIMULACIÓN DE DATOS (después conectarás Supabase)
+# ========================================
+AGENTES_SIMULADOS = 20
+
+def simular_datos(almacen, almacen_intervalos):
+    # Simulo datos - después esto será tu query a Supabase
+    # Generador con semilla fija: todos los procesos sirven los mismos números.
+    # Se guardan los intervalos de 30 min y su agregado diario
+    agentes = generar_agentes(AGENTES_SIMULADOS)
+    desde = pd.Timestamp(datetime.now().year - 2, 1, 1)
+    escribir_en_almacen(almacen, desde, datetime.now(), agentes,
+                        almacen_intervalos=almacen_intervalos)
+
+# Columnas que usa esta vista (proyección en la lectura del almacén)
+COLUMNAS_DASHBOARD = ['fecha', *DIMENSIONES, *COMPONENTES]
+
+@st.cache_resource
+def abrir_almacenes():
+    # Almacenes Parquet: diario particionado por mes e intervalos por día
+    # (el ETL incremental reescribe solo los días que carga); se rellenan con
+    # datos simulados si están vacíos o tienen un esquema antiguo
+    almacen = AlmacenKPI()
+    almacen_intervalos = AlmacenKPI(RUTA_INTERVALOS, particion='dia')
+    if not all(a.existe() and set(COLUMNAS_DASHBOARD) <= set(a.columnas())
+               for a in (almacen, almacen_intervalos)):
+        almacen_intervalos.vaciar()
+        simular_datos(almacen, almacen_intervalos)
+        # Los rollups de los datos anteriores ya no valen
+        for tabla in Rollups(almacen, almacen_intervalos).tablas.values():
+            tabla.vaciar()
+    return almacen, almacen_intervalos
+
+@st.cache_resource
+def abrir_rollups():
+    # Tablas semanal y mensual que el ETL mantiene celda a celda; si aún no
+    # existen (datos recién simulados) se construyen una vez desde el diario
+    rollups = Rollups(*abrir_almacenes())
+    for granularidad, tabla in rollups.tablas.items():
+        if not tabla.existe():
+            rollups.reconstruir(granularidad)
+    return rollups.tablas
+
+@st.cache_data
+def cargar_agentes():
+    almacen, _ = abrir_almacenes()
+    return almacen.leer_dimension('agentes')
+
 # ========================================
 # BARRA LATERAL CON FILTROS
 # ========================================
 st.sidebar.title(f"👤 {st.session_state.usuario}")
 st.sidebar.write(f"Rol: {st.session_state.rol}")
 
+# Roles que ven a todos los agentes (y eligen agente en los filtros); el
+# resto de roles solo ve sus propios datos
+ROLES_TODOS_LOS_AGENTES = ["director", "comercial"]
+
+# Fragmentos de la página y filtros de los que depende cada uno. Al aplicar
+# los filtros solo se vuelven a ejecutar los fragmentos que usan alguno de
+# los que han cambiado (el resto de la página, login y banner incluidos, no)
+DEPENDENCIAS = {
+    'tarjetas': {'vertical', 'agente', 'fecha_inicio', 'fecha_fin', 'comparar_con'},
+    'tendencias': {'vertical', 'agente', 'fecha_inicio', 'fecha_fin', 'granularidad'},
+    'analisis': {'vertical', 'agente', 'fecha_inicio', 'fecha_fin'},
+    'agentes': {'vertical', 'fecha_inicio', 'fecha_fin'},
+    'crudos': {'vertical', 'agente', 'fecha_inicio', 'fecha_fin'},
+}
+
+# Fragmentos dibujados en la última ejecución completa (los de pestañas
+# cerradas no existen y no se pueden volver a ejecutar)
+st.session_state.fragmentos = set()
+
+agentes = cargar_agentes()
+nombres_agente = {TODOS: TODOS, **dict(zip(agentes['agente_id'], agentes['nombre']))}
+
+# Filtros aplicados: los que usa la página. Los widgets del formulario solo
+# los cambian al pulsar "Aplicar" y tras validarlos
+if 'filtros_aplicados' not in st.session_state:
+    st.session_state.filtros_aplicados = {
+        'vertical': TODOS,
+        'agente': TODOS,
+        'fecha_inicio': (datetime.now() - timedelta(days=30)).date(),
+        'fecha_fin': datetime.now().date(),
+        'granularidad': GRANULARIDADES[0],
+        'comparar_con': COMPARACIONES[0],
+    }
+
+def filtros_actuales():
+    # En un rerun de fragmento la barra lateral no se ejecuta: los filtros
+    # se leen siempre de session_state
+    return st.session_state.filtros_aplicados
+
+def validar_filtros(nuevos):
+    # Mensaje de error si la combinación no es válida; corrige el agente
+    # si ya no pertenece al vertical elegido
+    if nuevos['fecha_inicio'] is None or nuevos['fecha_fin'] is None:
+        return "Indica la fecha de inicio y la de fin"
+    if nuevos['fecha_fin'] < nuevos['fecha_inicio']:
+        return "La fecha fin es anterior a la fecha inicio"
+    if nuevos['vertical'] != TODOS and nuevos['agente'] != TODOS \
+            and nuevos['agente'] not in set(agentes.loc[agentes['vertical'] == nuevos['vertical'], 'agente_id']):
+        nuevos['agente'] = TODOS
+    return None
+
+def aplicar_filtros():
+    # Callback de "Aplicar": valida el lote de cambios y vuelve a ejecutar
+    # solo los fragmentos que dependen de algún filtro cambiado. Si la tupla
+    # efectiva no cambia (o no es válida) solo se redibuja el panel
+    estado = st.session_state
+    aplicados = estado.filtros_aplicados
+    nuevos = {clave: estado.get(f'filtro_{clave}', aplicados[clave]) for clave in aplicados}
+    estado.error_filtros = validar_filtros(nuevos)
+    if 'filtro_agente' in estado:
+        # Si la validación ha devuelto el agente a "Todos", el widget también
+        # (si no, el siguiente "Aplicar" volvería a enviar el agente inválido)
+        estado.filtro_agente = nuevos['agente']
+    if estado.error_filtros or nuevos == aplicados:
+        return
+    cambiados = {clave for clave in nuevos if nuevos[clave] != aplicados[clave]}
+    estado.filtros_aplicados = nuevos
+    afectados = [f for f in estado.fragmentos if cambiados & DEPENDENCIAS[f]]
+    st.rerun(['filtros', *afectados])
+
+def fragmento(clave):
+    # st.fragment con clave: dibuja con los filtros aplicados y queda anotado
+    # para que aplicar_filtros() pueda volver a ejecutarlo
+    def decorador(dibujar):
+        @st.fragment(key=clave)
+        def ejecutar():
+            st.session_state.fragmentos.add(clave)
+            dibujar(filtros_actuales())
+        return ejecutar
+    return decorador
+
+@st.fragment(key='filtros')
+def panel_filtros():
+    # Formulario: los cambios de los widgets no relanzan nada hasta "Aplicar"
+    # y se aplican todos a la vez
+    aplicados = filtros_actuales()
+    st.header("🔍 Filtros")
+    with st.form('formulario_filtros', border=False):
+        verticales = [TODOS] + sorted(agentes['vertical'].unique())
+        st.selectbox("Vertical", verticales, index=verticales.index(aplicados['vertical']),
+                     key='filtro_vertical')
+
+        st.date_input("Fecha inicio", aplicados['fecha_inicio'], key='filtro_fecha_inicio')
+
+        st.date_input("Fecha fin", aplicados['fecha_fin'], key='filtro_fecha_fin')
+
+        # Mostrar filtro de agente solo si el usuario es director/comercial;
+        # las opciones son las del vertical aplicado
+        if st.session_state.rol in ROLES_TODOS_LOS_AGENTES:
+            vertical = aplicados['vertical']
+            agentes_vertical = agentes if vertical == TODOS else agentes[agentes['vertical'] == vertical]
+            opciones = [TODOS] + agentes_vertical['agente_id'].tolist()
+            st.selectbox("Agente", opciones, index=opciones.index(aplicados['agente']),
+                         format_func=nombres_agente.get, key='filtro_agente')
+
+        st.radio("Granularidad temporal", GRANULARIDADES,
+                 index=GRANULARIDADES.index(aplicados['granularidad']), key='filtro_granularidad')
+
+        st.selectbox("Comparar con", COMPARACIONES,
+                     index=COMPARACIONES.index(aplicados['comparar_con']), key='filtro_comparar_con')
+
+        st.form_submit_button("Aplicar filtros", on_click=aplicar_filtros, type="primary")
+
+    if st.session_state.get('error_filtros'):
+        st.error(st.session_state.error_filtros)
+
 # Filtros dinámicos según rol
 st.sidebar.markdown("---")
-st.sidebar.header("🔍 Filtros")
+with st.sidebar:
+    panel_filtros()
 
-vertical = st.sidebar.selectbox(
-    "Vertical",
-    ["Todos", "Venta", "Retención", "Venta (Outbound)", "Venta (Inbound)"]
-)
+# ========================================
+# CARGA DE DATOS
+# ========================================
+CACHE_TTL = 300  # segundos (5 minutos, como en la propuesta)
+CACHE_MB = 256   # presupuesto de memoria de la caché de consultas
+FIGURAS_MB = 64  # presupuesto de la caché de figuras (JSON)
 
-fecha_inicio = st.sidebar.date_input(
-    "Fecha inicio",
-    datetime.now() - timedelta(days=30)
-)
+def version_datos():
+    # Token que cambia con cada carga (ETL o simulación) en los almacenes
+    return '-'.join(a.version() for a in (*abrir_almacenes(), *abrir_rollups().values()))
 
-fecha_fin = st.sidebar.date_input(
-    "Fecha fin",
-    datetime.now()
-)
+@st.cache_resource
+def cache_consultas():
+    # Una sola caché para todas las sesiones del proceso
+    return CacheConsultas(presupuesto_mb=CACHE_MB, ttl=CACHE_TTL)
+
+@st.cache_resource
+def cache_figuras():
+    # JSON de las figuras Plotly, compartido por todas las sesiones
+    return CacheFiguras(presupuesto_mb=FIGURAS_MB, ttl=CACHE_TTL)
+
+def ambito_cache():
+    # El usuario solo entra en las claves de caché si su rol lo limita a sus
+    # datos: el resto comparte una entrada por tupla de filtros
+    return None if st.session_state.rol in ROLES_TODOS_LOS_AGENTES else st.session_state.usuario
 
-# Mostrar filtro de agente solo si el usuario es director/comercial
-if st.session_state.rol in ["director", "comercial"]:
-    agente = st.sidebar.selectbox(
-        "Agente",
-        ["Todos", "Juan Pérez", "María García", "Carlos López"]
+def figura(fragmento, grafico, f, construir, *extra):
+    # Figura desde la caché: la clave es el ámbito del usuario, los filtros de
+    # los que depende el fragmento del gráfico (más ``extra``) y la versión de los datos
+    filtros = (ambito_cache(), *(f[k] for k in sorted(DEPENDENCIAS[fragmento])), *extra)
+    return cache_figuras().obtener(grafico, filtros, construir, version=version_datos())
+
+@st.cache_resource(ttl=CACHE_TTL, max_entries=16)  # Cachea los datos para mejor performance
+def cargar_datos(mes_inicio, mes_fin, version):
+    # Solo se leen las particiones y columnas de los meses pedidos;
+    # el índice por dimensión se construye una vez por carga.
+    # Recurso compartido: todas las sesiones usan el mismo objeto (sin copias
+    # por acierto); las columnas son de solo lectura sobre buffers de Arrow
+    almacen, _ = abrir_almacenes()
+    df = almacen.leer(mes_inicio, mes_fin, columnas=COLUMNAS_DASHBOARD)
+    # Semanas y meses de los rollups del ETL (sumas por vertical × agente)
+    rollups = {granularidad: tabla.leer(mes_inicio, mes_fin, columnas=COLUMNAS_DASHBOARD)
+               for granularidad, tabla in abrir_rollups().items()}
+    return SerieTemporal(df), IndiceDimensiones(df), \
+        {granularidad: (r, IndiceDimensiones(r)) for granularidad, r in rollups.items()}
+
+@st.cache_data(ttl=CACHE_TTL, max_entries=64)
+def cargar_perfil_intradia(fecha_inicio, fecha_fin, vertical, agente, version):
+    # KPIs por franja horaria desde la tabla de intervalos; vertical y
+    # agente se empujan como filtros al lector Parquet
+    _, almacen_intervalos = abrir_almacenes()
+    filtros = {'vertical': vertical, 'agente_id': agente}
+    df = almacen_intervalos.leer(
+        fecha_inicio, fecha_fin, columnas=COLUMNAS_DASHBOARD,
+        filtros={k: (None if v == TODOS else v) for k, v in filtros.items()}
     )
+    return perfil_intradia(df)
 
-granularidad = st.sidebar.radio(
-    "Granularidad temporal",
-    ["Día", "Semana", "Mes"]
-)
+@st.cache_data(ttl=CACHE_TTL)
+def primera_fecha(version):
+    # Inicio del histórico del almacén diario
+    almacen, _ = abrir_almacenes()
+    return almacen.primera_fecha()
 
-# ========================================
-# SIMULACIÓN DE DATOS (después conectarás Supabase)
-# ========================================
-@st.cache_data  # Cachea los datos para mejor performance
-def cargar_datos():
-    # Simulo datos - después esto será tu query a Supabase
-    fechas = pd.date_range(start='2024-01-01', end='2024-12-31', freq='D')
-    
-    data = {
-        'fecha': fechas,
-        'nivel_servicio': np.random.uniform(85, 98, len(fechas)),
-        'llamadas_totales': np.random.randint(100, 500, len(fechas)),
-        'llamadas_atendidas': np.random.randint(90, 480, len(fechas)),
-        'tmo': np.random.uniform(3, 8, len(fechas)),  # minutos
-        'tma': np.random.uniform(1, 3, len(fechas)),
-        'polizas_vendidas': np.random.randint(5, 50, len(fechas)),
-        'presupuestos': np.random.randint(20, 100, len(fechas)),
-    }
-    
-    df = pd.DataFrame(data)
-    df['tasa_conversion'] = (df['polizas_vendidas'] / df['presupuestos']) * 100
-    return df
+@st.cache_resource(ttl=CACHE_TTL, max_entries=64)
+def preparar_vista(_datos, clave_carga, vertical, agente):
+    # Filas del vertical × agente por intersección de índices, agregadas por
+    # día y por semana/mes desde los rollups; sobre la serie diaria se
+    # calculan las sumas acumuladas de las tarjetas
+    serie, indice, rollups = _datos
+    filtros = {'vertical': vertical, 'agente_id': agente}
+    diario = combinar([serie.df.iloc[indice.filas(filtros)]], claves=('fecha',))
+    tablas = {granularidad: combinar([df.iloc[indice_rollup.filas(filtros)]], claves=('fecha',))
+              for granularidad, (df, indice_rollup) in rollups.items()}
+    agregados = AgregadosKPI(diario, tablas)
+    # Las ventanas de comparación que empiezan antes que los datos no se comparan
+    return agregados, AcumuladosKPI(agregados.diario, desde=primera_fecha(version_datos()))
+
+def cargar(f):
+    # Se cargan meses completos (la caché se comparte entre rangos del mismo mes)
+    # desde el inicio de la ventana de comparación más antigua, y el rango exacto
+    # se corta con búsqueda binaria sobre la fecha ordenada
+    version = version_datos()
+    clave_carga = (
+        inicio_comparaciones(f['fecha_inicio'], f['fecha_fin']).to_period('M').start_time.date(),
+        pd.Timestamp(f['fecha_fin']).to_period('M').end_time.date(),
+        version
+    )
+    return cargar_datos(*clave_carga), clave_carga, version
 
-df = cargar_datos()
+def cargar_kpis(f):
+    # Resultado de la vista para una tupla de filtros, servido desde la caché
+    # compartida: las vistas populares ("últimos 30 días, Todos") se calculan
+    # una vez para todas las sesiones hasta que caduca el TTL o hay datos nuevos
+    datos, clave_carga, version = cargar(f)
+    def calcular():
+        agregados, acumulados = preparar_vista(datos, clave_carga, f['vertical'], f['agente'])
+        return {
+            'diario': agregados.diario.rango(f['fecha_inicio'], f['fecha_fin']),
+            # Tabla de la granularidad elegida para los gráficos de tendencia
+            'periodo': agregados.rango(f['granularidad'], f['fecha_inicio'], f['fecha_fin']),
+            # Rango actual y ventanas de comparación en una sola pasada
+            'tarjetas': acumulados.comparativa(f['fecha_inicio'], f['fecha_fin']),
+        }
+    clave = (ambito_cache(), f['vertical'], f['agente'], f['fecha_inicio'], f['fecha_fin'], f['granularidad'])
+    return cache_consultas().obtener(clave, calcular, version=version)
 
-# Filtrar datos según fechas seleccionadas
-df_filtrado = df[(df['fecha'] >= pd.Timestamp(fecha_inicio)) & 
-                 (df['fecha'] <= pd.Timestamp(fecha_fin))]
+def ranking_agentes(f):
+    # KPIs de todos los agentes del vertical en el rango con una sola
+    # agregación agrupada (filas = índice del vertical ∩ rango de fechas)
+    datos, _, version = cargar(f)
+    def calcular():
+        serie, indice, _ = datos
+        filas = indice.filas({'vertical': f['vertical']}, *serie.indices(f['fecha_inicio'], f['fecha_fin']))
+        return kpis_por_agente(serie.df, filas, cargar_agentes())
+    clave = ('ranking', f['vertical'], f['fecha_inicio'], f['fecha_fin'])
+    return cache_consultas().obtener(clave, calcular, version=version)
 
 # ========================================
 # DASHBOARD PRINCIPAL
@@ -144,90 +387,131 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
-st.markdown(f"**Período:** {fecha_inicio} - {fecha_fin} | **Vertical:** {vertical}")
-
 # ========================================
 # MÉTRICAS PRINCIPALES (KPIs Cards)
 # ========================================
-col1, col2, col3, col4 = st.columns(4)
-
-with col1:
-    nivel_servicio = df_filtrado['nivel_servicio'].mean()
-    st.metric(
-        label="📞 Nivel de Servicio",
-        value=f"{nivel_servicio:.1f}%",
-        delta=f"{nivel_servicio - 90:.1f}% vs objetivo (90%)"
-    )
+def variacion(actual, anterior, unidad, comparar_con, relativa=False):
+    # Texto del delta de una tarjeta; None si no hay datos del periodo anterior
+    if pd.isna(actual) or pd.isna(anterior) or (relativa and anterior == 0):
+        return None
+    cambio = (actual / anterior - 1) * 100 if relativa else actual - anterior
+    return f"{cambio:+.1f}{unidad} vs {comparar_con.lower()}"
 
-with col2:
-    total_llamadas = df_filtrado['llamadas_totales'].sum()
-    st.metric(
-        label="📲 Total Llamadas",
-        value=f"{total_llamadas:,}",
-        delta=f"+{np.random.randint(5, 15)}% vs mes anterior"
-    )
+# Objetivo de nivel de servicio declarado en el registro de KPIs
+OBJETIVO_NS = REGISTRO['nivel_servicio'].objetivo
 
-with col3:
-    tmo_promedio = df_filtrado['tmo'].mean()
-    st.metric(
-        label="⏱️ TMO Promedio",
-        value=f"{tmo_promedio:.1f} min",
-        delta=f"-{np.random.uniform(0.1, 0.5):.1f} min"
-    )
+@fragmento('tarjetas')
+def tarjetas(f):
+    st.markdown(f"**Período:** {f['fecha_inicio']} - {f['fecha_fin']} | **Vertical:** {f['vertical']} "
+                f"| **Agente:** {nombres_agente[f['agente']]}")
 
-with col4:
-    tasa_conv = df_filtrado['tasa_conversion'].mean()
-    st.metric(
-        label="💰 Tasa Conversión",
-        value=f"{tasa_conv:.1f}%",
-        delta=f"+{np.random.uniform(1, 3):.1f}%"
-    )
+    # KPIs del rango y de la ventana de comparación elegida (sumas acumuladas)
+    vista = cargar_kpis(f)
+    comparar_con = f['comparar_con']
+    # Sin datos de toda la ventana de comparación (None) no se muestra delta
+    kpis_rango, kpis_anterior = vista['tarjetas']['Actual'], vista['tarjetas'][comparar_con] or {}
+
+    col1, col2, col3, col4 = st.columns(4)
+
+    with col1:
+        nivel_servicio = kpis_rango['nivel_servicio']
+        st.metric(
+            label="📞 Nivel de Servicio",
+            value=f"{nivel_servicio:.1f}%",
+            delta=f"{nivel_servicio - OBJETIVO_NS:.1f}% vs objetivo ({OBJETIVO_NS}%)"
+        )
+
+    with col2:
+        total_llamadas = kpis_rango['total_llamadas']
+        st.metric(
+            label="📲 Total Llamadas",
+            value=f"{total_llamadas:,}",
+            delta=variacion(total_llamadas, kpis_anterior.get('total_llamadas'), "%", comparar_con,
+                              relativa=True)
+        )
+
+    with col3:
+        tmo_promedio = kpis_rango['tmo']
+        st.metric(
+            label="⏱️ TMO Promedio",
+            value=f"{tmo_promedio:.1f} min",
+            delta=variacion(tmo_promedio, kpis_anterior.get('tmo'), " min", comparar_con),
+            delta_color="inverse"  # Menos TMO es mejor
+        )
+
+    with col4:
+        tasa_conv = kpis_rango['tasa_conversion']
+        st.metric(
+            label="💰 Tasa Conversión",
+            value=f"{tasa_conv:.1f}%",
+            delta=variacion(tasa_conv, kpis_anterior.get('tasa_conversion'), " pp", comparar_con)
+        )
+
+tarjetas()
 
 # ========================================
 # GRÁFICOS INTERACTIVOS
 # ========================================
 st.markdown("---")
 
-# Tabs para organizar visualizaciones
-tab1, tab2, tab3 = st.tabs(["📈 Tendencias", "📊 Análisis Detallado", "👥 Por Agente"])
+ETIQUETAS_VOLUMEN = {"Día": "Llamadas Diarias", "Semana": "Llamadas Semanales",
+                     "Mes": "Llamadas Mensuales"}
+
+# Puntos máximos de una serie temporal: uno por píxel del ancho del gráfico
+# a pantalla completa (configurable con ASISA_ANCHO_GRAFICO); los gráficos
+# en media columna reciben la mitad
+ANCHO_GRAFICO_PX = int(os.environ.get("ASISA_ANCHO_GRAFICO", 1200))
+
+# Cada pestaña se dibuja en su función: solo se construyen (y se envían al
+# navegador) las figuras de la pestaña abierta
+@fragmento('tendencias')
+def pestana_tendencias(f):
+    df_periodo, granularidad = cargar_kpis(f)['periodo'], f['granularidad']
 
-with tab1:
     st.subheader("Evolución del Nivel de Servicio")
     
     # Gráfico con Plotly (interactivo)
-    fig = px.line(
-        df_filtrado, 
-        x='fecha', 
-        y='nivel_servicio',
-        title='Nivel de Servicio a lo largo del tiempo',
-        labels={'nivel_servicio': 'Nivel de Servicio (%)', 'fecha': 'Fecha'}
-    )
-    fig.add_hline(y=90, line_dash="dash", line_color="red", 
-                  annotation_text="Objetivo: 90%")
-    st.plotly_chart(fig, use_container_width=True)
+    def nivel_servicio():
+        # LTTB: conserva la forma de la curva y sus caídas
+        fig = px.line(
+            submuestrear(df_periodo, 'fecha', 'nivel_servicio', ANCHO_GRAFICO_PX), 
+            x='fecha', 
+            y='nivel_servicio',
+            title=f'Nivel de Servicio a lo largo del tiempo (por {granularidad.lower()})',
+            labels={'nivel_servicio': 'Nivel de Servicio (%)', 'fecha': 'Fecha'}
+        )
+        fig.add_hline(y=OBJETIVO_NS, line_dash="dash", line_color="red", 
+                      annotation_text=f"Objetivo: {OBJETIVO_NS}%")
+        return fig
+    st.plotly_chart(figura('tendencias', 'nivel_servicio', f, nivel_servicio),
+                    width="stretch")
     
     # Segundo gráfico
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("TMO + TMA")
-        df_filtrado['tmo_tma'] = df_filtrado['tmo'] + df_filtrado['tma']
-        fig2 = px.area(df_filtrado, x='fecha', y='tmo_tma',
-                       title='Tiempo medio total de gestión')
-        st.plotly_chart(fig2, use_container_width=True)
+        fig2 = figura('tendencias', 'tmo_tma', f, lambda: px.area(
+            submuestrear(df_periodo, 'fecha', 'tmo_tma', ANCHO_GRAFICO_PX // 2, metodo="min_max"),
+            x='fecha', y='tmo_tma', title='Tiempo medio total de gestión'))
+        st.plotly_chart(fig2, width="stretch")
     
     with col2:
-        st.subheader("Llamadas Diarias")
-        fig3 = px.bar(df_filtrado, x='fecha', y='llamadas_totales',
-                      title='Volumen de llamadas')
-        st.plotly_chart(fig3, use_container_width=True)
+        st.subheader(ETIQUETAS_VOLUMEN[granularidad])
+        fig3 = figura('tendencias', 'volumen', f, lambda: px.bar(
+            submuestrear(df_periodo, 'fecha', 'llamadas_totales', ANCHO_GRAFICO_PX // 2, metodo="min_max"),
+            x='fecha', y='llamadas_totales', title='Volumen de llamadas'))
+        st.plotly_chart(fig3, width="stretch")
+
+@fragmento('analisis')
+def pestana_analisis(f):
+    df_filtrado = cargar_kpis(f)['diario']
 
-with tab2:
     st.subheader("Análisis de Conversión (Venta)")
     
-    # Gráfico combinado
-    fig4 = px.scatter(
-        df_filtrado, 
+    # Gráfico combinado (los días sin presupuestos no tienen tasa de conversión)
+    fig4 = figura('analisis', 'conversion', f, lambda: px.scatter(
+        df_filtrado.dropna(subset=['tasa_conversion']), 
         x='presupuestos', 
         y='polizas_vendidas',
         size='tasa_conversion',
@@ -237,8 +521,26 @@ with tab2:
             'presupuestos': 'Presupuestos Realizados',
             'polizas_vendidas': 'Pólizas Vendidas'
         }
-    )
-    st.plotly_chart(fig4, use_container_width=True)
+    ))
+    st.plotly_chart(fig4, width="stretch")
+    
+    # Perfil intradía (intervalos de 30 min): caídas del servicio en horas pico
+    st.subheader("Nivel de Servicio por Franja Horaria")
+    def franjas():
+        perfil = cargar_perfil_intradia(f['fecha_inicio'], f['fecha_fin'], f['vertical'], f['agente'],
+                                        version_datos())
+        fig_franjas = px.line(
+            perfil,
+            x='franja',
+            y='nivel_servicio',
+            markers=True,
+            title='Nivel de Servicio medio por franja horaria',
+            labels={'nivel_servicio': 'Nivel de Servicio (%)', 'franja': 'Franja'}
+        )
+        fig_franjas.add_hline(y=OBJETIVO_NS, line_dash="dash", line_color="red",
+                              annotation_text=f"Objetivo: {OBJETIVO_NS}%")
+        return fig_franjas
+    st.plotly_chart(figura('analisis', 'franjas', f, franjas), width="stretch")
     
     # Usar Seaborn (tu librería favorita)
     st.subheader("Distribución de KPIs")
@@ -246,7 +548,7 @@ with tab2:
     
     sns.histplot(df_filtrado['nivel_servicio'], kde=True, ax=ax[0], color='skyblue')
     ax[0].set_title('Distribución Nivel de Servicio')
-    ax[0].axvline(90, color='red', linestyle='--', label='Objetivo')
+    ax[0].axvline(OBJETIVO_NS, color='red', linestyle='--', label='Objetivo')
     ax[0].legend()
     
     sns.boxplot(data=df_filtrado[['tmo', 'tma']], ax=ax[1])
@@ -254,33 +556,64 @@ with tab2:
     
     st.pyplot(fig5)
 
-with tab3:
+@fragmento('agentes')
+def pestana_agentes(f):
     st.subheader("Ranking de Agentes")
     
-    # Simular datos por agente
-    agentes_data = pd.DataFrame({
-        'Agente': ['Juan Pérez', 'María García', 'Carlos López', 'Ana Martínez', 'Luis Rodríguez'],
-        'Llamadas': [450, 520, 380, 490, 410],
-        'Nivel Servicio': [95.2, 92.8, 89.5, 94.1, 91.3],
-        'TMO': [4.2, 5.1, 3.8, 4.5, 4.8],
-        'Pólizas Vendidas': [28, 35, 22, 31, 26]
-    })
+    col_criterio, col_k = st.columns(2)
+    with col_criterio:
+        criterio = st.selectbox(
+            "Ordenar por",
+            ['Nivel Servicio', 'Pólizas Vendidas', 'Llamadas', 'Tasa Conversión', 'TMO']
+        )
+    with col_k:
+        k = st.slider("Agentes a mostrar", min_value=3, max_value=20, value=5)
     
-    # Tabla interactiva
-    st.dataframe(
-        agentes_data.style.background_gradient(subset=['Nivel Servicio'], cmap='RdYlGn'),
-        use_container_width=True
-    )
+    # KPIs por agente calculados desde la tabla de hechos (cacheados por
+    # filtros); top/bottom-K por selección parcial, sin ordenar a todos
+    tabla_agentes = ranking_agentes(f)
+    columna = {v: c for c, v in COLUMNAS_RANKING.items()}[criterio]
+    mayor_es_mejor = REGISTRO[columna].mayor_es_mejor  # En TMO menos es mejor
+    mejores = seleccionar_extremos(tabla_agentes, columna, k, mejores=mayor_es_mejor)
+    peores = seleccionar_extremos(tabla_agentes, columna, k, mejores=not mayor_es_mejor)
+    
+    col1, col2 = st.columns(2)
+    for col, titulo, agentes_data in ((col1, f"🏆 Top {k}", mejores), (col2, f"⚠️ Bottom {k}", peores)):
+        with col:
+            st.markdown(f"**{titulo}**")
+            # Tabla interactiva
+            st.dataframe(
+                agentes_data[list(COLUMNAS_RANKING)].rename(columns=COLUMNAS_RANKING)
+                .style.background_gradient(subset=['Nivel Servicio'], cmap='RdYlGn')
+                .format(precision=1),
+                width="stretch",
+                hide_index=True
+            )
     
     # Gráfico de barras
-    fig6 = px.bar(
-        agentes_data, 
+    fig6 = figura('agentes', 'ranking', f, lambda: px.bar(
+        mejores.rename(columns=COLUMNAS_RANKING), 
         x='Agente', 
         y='Pólizas Vendidas',
         color='Nivel Servicio',
-        title='Pólizas Vendidas por Agente'
-    )
-    st.plotly_chart(fig6, use_container_width=True)
+        title=f'Pólizas Vendidas - Top {k} por {criterio}'
+    ), criterio, k)
+    st.plotly_chart(fig6, width="stretch")
+
+PESTANAS = {
+    "📈 Tendencias": pestana_tendencias,
+    "📊 Análisis Detallado": pestana_analisis,
+    "👥 Por Agente": pestana_agentes,
+}
+
+# Tabs para organizar visualizaciones. Con on_change="rerun" Streamlit sabe
+# qué pestaña está abierta (tab.open) y las demás no ejecutan nada hasta
+# que se seleccionan
+tabs = st.tabs(list(PESTANAS), key="pestana", on_change="rerun")
+for tab, dibujar in zip(tabs, PESTANAS.values()):
+    with tab:
+        if tab.open:
+            dibujar()
 
 # ========================================
 # TABLA DE DATOS DETALLADOS
@@ -288,26 +621,65 @@ with tab3:
 st.markdown("---")
 st.subheader("📋 Datos Detallados")
 
-if st.checkbox("Mostrar datos crudos"):
-    st.dataframe(
-        df_filtrado[['fecha', 'nivel_servicio', 'llamadas_totales', 
-                     'tmo', 'tma', 'polizas_vendidas', 'tasa_conversion']],
-        use_container_width=True
-    )
-    
-    # Botón de descarga
-    csv = df_filtrado.to_csv(index=False)
-    st.download_button(
-        label="📥 Descargar datos en CSV",
-        data=csv,
-        file_name=f"datos_asisa_{fecha_inicio}_{fecha_fin}.csv",
-        mime="text/csv"
-    )
+# El checkbox está dentro del fragmento: mostrar u ocultar los datos crudos
+# solo vuelve a ejecutar esta sección
+@fragmento('crudos')
+def datos_crudos(f):
+    if st.checkbox("Mostrar datos crudos"):
+        df_filtrado = cargar_kpis(f)['diario']
+        st.dataframe(
+            df_filtrado[['fecha', 'nivel_servicio', 'llamadas_totales', 
+                         'tmo', 'tma', 'polizas_vendidas', 'tasa_conversion']],
+            width="stretch"
+        )
+        
+        # Botón de descarga
+        csv = df_filtrado.to_csv(index=False)
+        st.download_button(
+            label="📥 Descargar datos en CSV",
+            data=csv,
+            file_name=f"datos_asisa_{f['fecha_inicio']}_{f['fecha_fin']}.csv",
+            mime="text/csv"
+        )
+
+datos_crudos()
 
 # ========================================
-# FOOTER
+# ESTADO DEL ETL
 # ========================================
+@st.cache_resource
+def arrancar_planificador():
+    # Opcional (ASISA_ETL_AUTOMATICO=1): ETL periódico en un hilo del servidor;
+    # el cerrojo evita solapes con otras réplicas o lanzamientos manuales.
+    # Se importa aquí porque el cerrojo usa fcntl (solo POSIX)
+    from etl.planificador import Planificador
+    return Planificador().en_segundo_plano()
+
+if os.environ.get("ASISA_ETL_AUTOMATICO") == "1":
+    arrancar_planificador()
+
 st.sidebar.markdown("---")
+ultimas = leer_metricas(n=1)
+if ultimas:
+    ultima = ultimas[-1]
+    etapas = ", ".join(f"{e} {s:.1f}s" for e, s in ultima.get('etapas', {}).items() if s >= 0.05)
+    filas = ultima.get('filas', {}).get('cargadas', 0)
+    st.sidebar.caption(f"🔄 Último ETL: {ultima['inicio'].replace('T', ' ')} · {ultima['estado']}"
+                       + (f" · {filas:,} filas" if ultima['estado'] == 'ok' else "")
+                       + (f" ({etapas})" if etapas else "")
+                       + (" · atraso pendiente" if ultima.get('pendiente') else ""))
+    if ultima['estado'] == 'error':
+        st.sidebar.caption(f"⚠️ {ultima['error']}")
+
+# Uso de la caché de figuras (compartida por todas las sesiones)
+if st.session_state.rol == "director":
+    uso = cache_figuras().estadisticas()
+    st.sidebar.caption(f"🖼️ Caché de figuras: {uso['aciertos']:,} aciertos / {uso['fallos']:,} fallos "
+                       f"· {uso['entradas']} figuras ({uso['memoria_mb']:.1f} MB)")
+
+# ========================================
+# FOOTER
+# ========================================
 if st.sidebar.button("🚪 Cerrar Sesión"):
     st.session_state.logged_in = False
     st.rerun()
\ No newline at end of file
@@ -0,0 +1,55 @@
+"""
+ETL incremental de los sistemas origen (TUIO, ARTEMISA, CORE SENDA) al
+almacén de KPIs que lee ``dashboard.py``.
+
+``etl.incremental`` y ``etl.planificador`` se importan al pedir uno de sus
+nombres: como también se ejecutan con ``python -m``, importarlos aquí haría
+que runpy los encontrara ya cargados al arrancar el paquete (``etl.metricas``
+también, porque importa ``etl.incremental``).
+"""
+
+import importlib
+
+from etl.calidad import REGLAS, Cuarentena, Regla, validar_calidad
+from etl.cambios import IndiceHashes
+from etl.carga import abrir_destino, cargar_por_lotes
+from etl.extraccion import extraer_fuentes
+from etl.fuentes import FuenteSQLite, crear_fuentes, simular_actividad
+from etl.rollups import Rollups
+
+_PEREZOSOS = {
+    "ETLIncremental": "etl.incremental",
+    "MarcaAgua": "etl.incremental",
+    "etl_incremental": "etl.incremental",
+    "CerrojoETL": "etl.planificador",
+    "Planificador": "etl.planificador",
+    "leer_metricas": "etl.metricas",
+}
+
+
+def __getattr__(nombre):
+    if nombre in _PEREZOSOS:
+        return getattr(importlib.import_module(_PEREZOSOS[nombre]), nombre)
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+
+__all__ = [
+    "REGLAS",
+    "CerrojoETL",
+    "Cuarentena",
+    "ETLIncremental",
+    "FuenteSQLite",
+    "IndiceHashes",
+    "MarcaAgua",
+    "Planificador",
+    "Regla",
+    "Rollups",
+    "abrir_destino",
+    "cargar_por_lotes",
+    "crear_fuentes",
+    "etl_incremental",
+    "extraer_fuentes",
+    "leer_metricas",
+    "simular_actividad",
+    "validar_calidad",
+]
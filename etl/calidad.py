@@ -0,0 +1,201 @@
+"""
+Validación de calidad de los lotes del ETL (``validar_calidad``).
+
+Cada regla se declara una vez con su nombre y una comprobación vectorizada
+que devuelve, para el lote entero, la máscara de filas válidas. Las filas
+que incumplen alguna regla no tumban el lote: se apartan a cuarentena con
+la lista de reglas incumplidas y el resto se carga. Se mide lo que tarda
+cada regla para vigilar que la validación siga siendo barata.
+
+Los componentes a NaN son "sin cambios" en la carga parcial (la fuente no
+los trae en este lote), así que las reglas entre columnas solo se aplican
+cuando ambas vienen informadas.
+"""
+
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from kpis.componentes import COMPONENTES
+from kpis.intervalos import COLUMNAS_INTERVALO
+
+CLAVES = ('fecha', 'agente_id')
+
+# Minutos máximos de conversación/espera imputables a una llamada atendida
+MAX_MINUTOS_LLAMADA = 120
+
+# Fechas de intervalo admitidas: desde el arranque del histórico hasta mañana
+FECHA_MINIMA = pd.Timestamp('2000-01-01')
+
+
+class Regla:
+    """
+    Comprobación de calidad: ``comprobar(df)`` devuelve la máscara de filas
+    válidas. Si una regla ``bloqueante`` falla, las siguientes no se evalúan
+    (dan por hecho lo que ella comprueba) y todo el lote va a cuarentena.
+    """
+
+    def __init__(self, nombre, descripcion, comprobar, bloqueante=False):
+        self.nombre = nombre
+        self.descripcion = descripcion
+        self.comprobar = comprobar
+        self.bloqueante = bloqueante
+
+    def __repr__(self):
+        return f"Regla({self.nombre!r})"
+
+
+def _valores(df, columna):
+    return df[columna].to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _no_mayor(df, menor, mayor, factor=1.0):
+    """``menor <= factor * mayor`` (válido si falta alguno de los dos)"""
+    return ~(_valores(df, menor) > factor * _valores(df, mayor))
+
+
+def _esquema(df):
+    """Todas las columnas presentes y componentes numéricos"""
+    correcto = set(COLUMNAS_INTERVALO) <= set(df.columns) \
+        and pd.api.types.is_datetime64_any_dtype(df['fecha']) \
+        and all(pd.api.types.is_numeric_dtype(df[c]) for c in COMPONENTES)
+    return np.full(len(df), correcto)
+
+
+def _claves_unicas(df):
+    """Sin repetidos de (fecha, agente_id): clave int64 = segundo × nº agentes + código"""
+    codigos, agentes = pd.factorize(df['agente_id'])
+    segundos = df['fecha'].to_numpy().astype('datetime64[s]').astype(np.int64)
+    clave = segundos * max(len(agentes), 1) + codigos
+    # Ordenar y comparar vecinos es más rápido que una tabla hash cuando,
+    # como es habitual, no hay repetidos (y los lotes llegan casi ordenados)
+    ordenada = np.sort(clave)
+    repetidas = ordenada[1:][ordenada[1:] == ordenada[:-1]]
+    if not len(repetidas):
+        return np.ones(len(df), dtype=bool)
+    return ~np.isin(clave, repetidas)
+
+
+def _no_negativos(df):
+    valores = df[COMPONENTES].to_numpy(dtype=np.float64, na_value=np.nan)
+    return ~(valores < 0).any(axis=1)
+
+
+def _fecha_en_rango(df):
+    fechas = df['fecha'].to_numpy()
+    return (fechas >= FECHA_MINIMA.to_datetime64()) \
+        & (fechas < (pd.Timestamp.now().normalize() + pd.Timedelta(days=2)).to_datetime64())
+
+
+REGLAS = [
+    Regla('esquema', "columnas esperadas, fecha datetime y componentes numéricos", _esquema,
+          bloqueante=True),
+    Regla('claves_no_nulas', "fecha y agente_id informados",
+          lambda df: df[['fecha', 'agente_id']].notna().all(axis=1).to_numpy()),
+    # La vertical sale del catálogo: sin ella el agente es desconocido
+    Regla('agente_conocido', "agente_id en el catálogo de agentes (con vertical)",
+          lambda df: df['vertical'].notna().to_numpy()),
+    Regla('claves_duplicadas', "una sola fila por (fecha, agente_id) en el lote", _claves_unicas),
+    Regla('fecha_en_rango', "fecha entre el inicio del histórico y mañana", _fecha_en_rango),
+    Regla('no_negativos', "componentes >= 0", _no_negativos),
+    Regla('atendidas_le_totales', "llamadas_atendidas <= llamadas_totales",
+          lambda df: _no_mayor(df, 'llamadas_atendidas', 'llamadas_totales')),
+    Regla('en_umbral_le_atendidas', "llamadas_en_umbral <= llamadas_atendidas",
+          lambda df: _no_mayor(df, 'llamadas_en_umbral', 'llamadas_atendidas')),
+    Regla('abandonadas_le_totales', "llamadas_abandonadas <= llamadas_totales",
+          lambda df: _no_mayor(df, 'llamadas_abandonadas', 'llamadas_totales')),
+    Regla('polizas_le_presupuestos', "polizas_vendidas <= presupuestos",
+          lambda df: _no_mayor(df, 'polizas_vendidas', 'presupuestos')),
+    Regla('minutos_tmo_en_rango', f"minutos_tmo <= {MAX_MINUTOS_LLAMADA} por llamada atendida",
+          lambda df: _no_mayor(df, 'minutos_tmo', 'llamadas_atendidas', MAX_MINUTOS_LLAMADA)),
+    Regla('minutos_tma_en_rango', f"minutos_tma <= {MAX_MINUTOS_LLAMADA} por llamada atendida",
+          lambda df: _no_mayor(df, 'minutos_tma', 'llamadas_atendidas', MAX_MINUTOS_LLAMADA)),
+]
+
+
+def validar_calidad(df, reglas=REGLAS):
+    """
+    Aplica ``reglas`` a ``df``.
+
+    Devuelve ``(validas, cuarentena, informe)``: filas que cumplen todas las
+    reglas, filas que incumplen alguna (con la columna ``reglas_fallidas``)
+    e informe por regla ``{nombre: {'fallos': n, 'segundos': s}}``.
+    """
+    validas = np.ones(len(df), dtype=bool)
+    fallos = {}
+    informe = {}
+    for regla in reglas:
+        t0 = time.perf_counter()
+        mascara = np.asarray(regla.comprobar(df), dtype=bool)
+        informe[regla.nombre] = {'fallos': int((~mascara).sum()), 'segundos': time.perf_counter() - t0}
+        if not mascara.all():
+            fallos[regla.nombre] = ~mascara
+            validas &= mascara
+            if regla.bloqueante:
+                break
+
+    cuarentena = df[~validas]
+    if len(cuarentena):
+        # Nombres de las reglas incumplidas, solo para las filas apartadas
+        incumplidas = [np.where(fallo[~validas], nombre + ",", "") for nombre, fallo in fallos.items()]
+        motivo = pd.Series(np.sum(np.vstack(incumplidas).astype(object), axis=0), index=cuarentena.index)
+        cuarentena = cuarentena.assign(reglas_fallidas=motivo.str.rstrip(","))
+    return df[validas], cuarentena, informe
+
+
+def _contiene(df, claves):
+    """Máscara de filas de ``df`` cuya ``(fecha, agente_id)`` está en ``claves``"""
+    indice = pd.MultiIndex.from_arrays([df['fecha'], df['agente_id'].astype(str)])
+    return indice.isin(pd.MultiIndex.from_arrays([claves['fecha'], claves['agente_id'].astype(str)]))
+
+
+class Cuarentena:
+    """
+    Filas rechazadas por la validación.
+
+    Cada rechazo nuevo se guarda en un Parquet por lote para revisarlo, y su
+    clave queda pendiente: el ETL vuelve a leerla de todas las fuentes en
+    cada ciclo hasta que pasa la validación (las fuentes ya avanzaron su
+    marca de agua y no la volverían a emitir si no cambia).
+    """
+
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+        self._fichero_pendientes = self.ruta / "pendientes.parquet"
+
+    def pendientes(self):
+        if not self._fichero_pendientes.exists():
+            return pd.DataFrame({'fecha': pd.Series(dtype='datetime64[ns]'),
+                                 'agente_id': pd.Series(dtype=object)})
+        return pd.read_parquet(self._fichero_pendientes)
+
+    def actualizar(self, revisadas, rechazadas):
+        """
+        ``revisadas``: claves validadas en este lote (las que pasan dejan de
+        estar pendientes); ``rechazadas``: filas que no pasan. Devuelve el
+        fichero con los rechazos nuevos, si los hay.
+        """
+        pendientes = self.pendientes()
+        nuevas = rechazadas[~_contiene(rechazadas, pendientes)]
+        siguen = pendientes[~_contiene(pendientes, revisadas)]
+        if len(siguen) == len(pendientes) and rechazadas.empty:
+            return None
+
+        self.ruta.mkdir(parents=True, exist_ok=True)
+        claves = pd.concat([siguen, rechazadas[list(CLAVES)].astype({'agente_id': str})], ignore_index=True)
+        claves.drop_duplicates().to_parquet(self._fichero_pendientes, index=False)
+        if nuevas.empty:
+            return None
+        fichero = self.ruta / f"lote_{datetime.now():%Y%m%d_%H%M%S_%f}.parquet"
+        nuevas.assign(fecha_cuarentena=pd.Timestamp.now()).to_parquet(fichero, index=False)
+        return fichero
+
+    def leer(self):
+        """Historial de rechazos (todos los lotes)"""
+        ficheros = sorted(self.ruta.glob("lote_*.parquet"))
+        if not ficheros:
+            return pd.DataFrame(columns=[*COLUMNAS_INTERVALO, 'reglas_fallidas', 'fecha_cuarentena'])
+        return pd.concat([pd.read_parquet(f) for f in ficheros], ignore_index=True)
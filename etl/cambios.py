@@ -0,0 +1,54 @@
+"""
+Detección de cambios por hash de contenido.
+
+Los sistemas origen vuelven a emitir filas que no han cambiado (basta con
+que se toque ``fecha_modificacion``). Para no reescribir ni re-agregar
+esas filas se guarda, junto a la tabla de intervalos, un hash por clave de
+negocio ``(fecha, agente_id)`` y fuente. Cada lote se hashea vectorizado
+(``pd.util.hash_pandas_object``) y solo pasan al upsert y al recálculo de
+KPIs las filas cuyo hash es nuevo o distinto.
+"""
+
+from pathlib import Path
+
+import pandas as pd
+
+from kpis.almacen import AlmacenKPI
+
+CLAVES = ('fecha', 'agente_id')
+
+
+def hash_filas(df, columnas):
+    """Hash de 64 bits del contenido de cada fila (sin el índice)"""
+    return pd.util.hash_pandas_object(df[list(columnas)], index=False).to_numpy()
+
+
+class IndiceHashes:
+    """Último hash cargado por ``(fecha, agente_id)`` de cada fuente, particionado por día"""
+
+    def __init__(self, ruta):
+        self.ruta = Path(ruta)
+        self._almacenes = {}
+
+    def _almacen(self, fuente):
+        if fuente not in self._almacenes:
+            self._almacenes[fuente] = AlmacenKPI(self.ruta / fuente, particion='dia')
+        return self._almacenes[fuente]
+
+    def filtrar_cambiados(self, fuente, df, columnas):
+        """Filas de ``df`` cuyo contenido en ``columnas`` no coincide con el índice (con columna ``hash``)"""
+        df = df.assign(hash=hash_filas(df, columnas))
+        almacen = self._almacen(fuente)
+        if df.empty or not almacen.existe():
+            return df
+
+        # Solo los días del lote (una corrección tardía no arrastra el rango intermedio)
+        previos = almacen.leer(columnas=[*CLAVES, 'hash'], particiones=almacen.particiones(df['fecha']))
+        # Cruce exacto por (clave, hash): sin coincidencia = fila nueva o cambiada
+        cruce = df[[*CLAVES, 'hash']].merge(previos.astype({'agente_id': str}),
+                                            on=[*CLAVES, 'hash'], how='left', indicator=True)
+        return df[(cruce['_merge'] == 'left_only').to_numpy()]
+
+    def registrar(self, fuente, df):
+        """Guarda los hashes de filas ya cargadas (salida de ``filtrar_cambiados``)"""
+        return self._almacen(fuente).actualizar(df[[*CLAVES, 'hash']], CLAVES)
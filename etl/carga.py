@@ -0,0 +1,180 @@
+"""
+Carga masiva por lotes de ``datos_consolidados`` en una base SQL.
+
+Las filas consolidadas se envían en lotes de tamaño fijo con la vía más
+rápida de cada motor: en PostgreSQL (Supabase) ``COPY`` a una tabla de
+staging temporal y un único ``INSERT ... ON CONFLICT`` por lote; en SQLite
+``executemany`` dentro de una transacción por lote. El upsert es parcial
+como el del almacén: un NULL entrante significa "sin cambios" y conserva
+el valor existente.
+"""
+
+import sqlite3
+import time
+from pathlib import Path
+
+from kpis.intervalos import COLUMNAS_INTERVALO
+from etl.fuentes import FORMATO_FECHA, TABLAS_FUENTE
+
+# Filas por lote: acota la memoria de la carga aunque haya horas de atraso
+TAMANO_LOTE = 50_000
+
+CLAVES = ('fecha', 'agente_id')
+
+# Tipo SQL (SQLite) de cada componente, el mismo que en la fuente que lo trae
+TIPOS_COMPONENTE = {columna: tipo for _, columnas in TABLAS_FUENTE.values()
+                    for columna, tipo in columnas.items()}
+
+TIPOS_POSTGRES = {'INTEGER': 'BIGINT', 'REAL': 'DOUBLE PRECISION'}
+
+# Componentes enteros: el join entre fuentes los deja en float64 si falta alguna
+ENTEROS = [columna for columna, tipo in TIPOS_COMPONENTE.items() if tipo == 'INTEGER']
+
+
+def lotes(df, tamano=TAMANO_LOTE):
+    for inicio in range(0, len(df), tamano):
+        yield df.iloc[inicio:inicio + tamano]
+
+
+def _filas(lote):
+    """
+    Tuplas en el orden de COLUMNAS_INTERVALO con None en lugar de NaN (NULL
+    en SQLite, ``\\N`` en COPY). Los componentes enteros se envían como int:
+    PostgreSQL rechaza ``1.0`` en una columna BIGINT.
+    """
+    lote = lote[COLUMNAS_INTERVALO].astype({c: 'Int64' for c in ENTEROS}).assign(
+        fecha=lote['fecha'].dt.strftime(FORMATO_FECHA),
+        vertical=lote['vertical'].astype(str),
+        agente_id=lote['agente_id'].astype(str),
+    ).astype(object)
+    return lote.where(lote.notna(), None).itertuples(index=False, name=None)
+
+
+def _actualizaciones(tabla, excluido):
+    componentes = [c for c in COLUMNAS_INTERVALO if c not in CLAVES]
+    return ", ".join(f"{c} = COALESCE({excluido}.{c}, {tabla}.{c})" for c in componentes)
+
+
+class DestinoSQLite:
+    """Tabla ``datos_consolidados`` en un fichero SQLite"""
+
+    def __init__(self, ruta, tabla='datos_consolidados'):
+        self.ruta = Path(ruta)
+        self.tabla = tabla
+        self._con = None
+
+    def _conectar(self):
+        # Una conexión para todos los lotes del destino
+        if self._con is None:
+            self.ruta.parent.mkdir(parents=True, exist_ok=True)
+            self._con = sqlite3.connect(self.ruta)
+            self._con.execute("PRAGMA journal_mode=WAL")
+            self._con.execute("PRAGMA synchronous=NORMAL")
+        return self._con
+
+    def crear(self):
+        componentes = ", ".join(f"{c} {t}" for c, t in TIPOS_COMPONENTE.items())
+        with self._conectar() as con:
+            con.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.tabla} (fecha TEXT NOT NULL, "
+                f"vertical TEXT NOT NULL, agente_id TEXT NOT NULL, {componentes}, "
+                f"PRIMARY KEY (fecha, agente_id))"
+            )
+        return self
+
+    def upsert(self, lote):
+        columnas = ", ".join(COLUMNAS_INTERVALO)
+        marcadores = ", ".join("?" * len(COLUMNAS_INTERVALO))
+        # Una transacción por lote: un solo fsync para todo el lote
+        with self._conectar() as con:
+            con.executemany(
+                f"INSERT INTO {self.tabla} ({columnas}) VALUES ({marcadores}) "
+                f"ON CONFLICT (fecha, agente_id) DO UPDATE SET "
+                f"{_actualizaciones(self.tabla, 'excluded')}",
+                _filas(lote)
+            )
+
+    def contar(self):
+        return self._conectar().execute(f"SELECT COUNT(*) FROM {self.tabla}").fetchone()[0]
+
+    def cerrar(self):
+        if self._con is not None:
+            self._con.close()
+            self._con = None
+
+
+class DestinoPostgres:
+    """Tabla ``datos_consolidados`` en PostgreSQL/Supabase (requiere ``psycopg`` 3)"""
+
+    def __init__(self, dsn, tabla='datos_consolidados'):
+        try:
+            import psycopg
+        except ImportError as error:
+            raise ImportError("La carga en PostgreSQL necesita psycopg: pip install 'psycopg[binary]'") from error
+        self._psycopg = psycopg
+        self.dsn = dsn
+        self.tabla = tabla
+        self._con = None
+
+    def _conectar(self):
+        # Autocommit: cada lote es su propia transacción explícita
+        if self._con is None:
+            self._con = self._psycopg.connect(self.dsn, autocommit=True)
+        return self._con
+
+    def crear(self):
+        componentes = ", ".join(f"{c} {TIPOS_POSTGRES[t]}" for c, t in TIPOS_COMPONENTE.items())
+        self._conectar().execute(
+            f"CREATE TABLE IF NOT EXISTS {self.tabla} (fecha TIMESTAMP NOT NULL, "
+            f"vertical TEXT NOT NULL, agente_id TEXT NOT NULL, {componentes}, "
+            f"PRIMARY KEY (fecha, agente_id))"
+        )
+        return self
+
+    def upsert(self, lote):
+        staging = f"{self.tabla}_staging"
+        columnas = ", ".join(COLUMNAS_INTERVALO)
+        con = self._conectar()
+        with con.transaction():
+            con.execute(
+                f"CREATE TEMP TABLE IF NOT EXISTS {staging} "
+                f"(LIKE {self.tabla} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS"
+            )
+            with con.cursor().copy(f"COPY {staging} ({columnas}) FROM STDIN") as copia:
+                for fila in _filas(lote):
+                    copia.write_row(fila)
+            con.execute(
+                f"INSERT INTO {self.tabla} AS t ({columnas}) SELECT {columnas} FROM {staging} "
+                f"ON CONFLICT (fecha, agente_id) DO UPDATE SET {_actualizaciones('t', 'EXCLUDED')}"
+            )
+
+    def contar(self):
+        return self._conectar().execute(f"SELECT COUNT(*) FROM {self.tabla}").fetchone()[0]
+
+    def cerrar(self):
+        if self._con is not None:
+            self._con.close()
+            self._con = None
+
+
+def abrir_destino(url):
+    """``postgresql://...`` -> PostgreSQL; cualquier otra cosa es la ruta de un SQLite"""
+    if url.startswith(("postgresql://", "postgres://")):
+        return DestinoPostgres(url).crear()
+    return DestinoSQLite(url.removeprefix("sqlite:///")).crear()
+
+
+def cargar_por_lotes(destino, df, tamano_lote=TAMANO_LOTE):
+    """Upsert de ``df`` en ``destino`` lote a lote; devuelve filas, lotes y filas/s"""
+    t0 = time.perf_counter()
+    n_lotes = 0
+    for lote in lotes(df, tamano_lote):
+        destino.upsert(lote)
+        n_lotes += 1
+    segundos = time.perf_counter() - t0
+    return {
+        'filas': len(df),
+        'lotes': n_lotes,
+        'segundos': segundos,
+        'filas_por_segundo': len(df) / segundos if segundos else 0.0,
+    }
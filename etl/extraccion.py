@@ -0,0 +1,65 @@
+"""
+Extracción concurrente de las fuentes del ETL.
+
+Las tres extracciones son esperas de red/E/S independientes, así que se
+lanzan a la vez en un pool de hilos acotado: el ciclo tarda lo que la
+fuente más lenta y no la suma de las tres. Cada fuente tiene su propio
+pool de conexiones (``FuenteSQLite.pool``), un tiempo máximo por intento
+y reintentos con espera exponencial ante errores transitorios.
+"""
+
+import random
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Segundos máximos por intento de extracción de una fuente
+TIMEOUT_EXTRACCION = 120.0
+
+# Intentos por fuente y espera base del backoff exponencial (segundos)
+INTENTOS = 3
+ESPERA_BASE = 0.5
+
+# Errores que merece la pena reintentar (bloqueos, cortes, tiempo agotado)
+ERRORES_TRANSITORIOS = (sqlite3.OperationalError, TimeoutError, ConnectionError)
+
+
+def con_reintentos(funcion, intentos=INTENTOS, espera_base=ESPERA_BASE,
+                   errores=ERRORES_TRANSITORIOS):
+    """
+    Llama a ``funcion()`` hasta ``intentos`` veces; entre fallos espera
+    ``espera_base * 2**k`` segundos con jitter para no sincronizar reintentos.
+    """
+    for intento in range(intentos):
+        try:
+            return funcion()
+        except errores:
+            if intento == intentos - 1:
+                raise
+            time.sleep(espera_base * 2 ** intento * random.uniform(0.5, 1.5))
+
+
+def extraer_fuentes(fuentes, marcas, max_hilos=None, timeout=TIMEOUT_EXTRACCION,
+                    intentos=INTENTOS, espera_base=ESPERA_BASE, limite=None):
+    """
+    Extrae todas las fuentes desde su marca de agua, en paralelo (como
+    mucho ``limite`` filas por fuente).
+
+    Devuelve ``(extraidos, segundos)``: DataFrame y duración por fuente. Si
+    una fuente agota sus intentos la excepción se propaga y el ciclo falla
+    sin avanzar ninguna marca. ``max_hilos=1`` las extrae en serie.
+    """
+    def extraer(nombre):
+        fuente = fuentes[nombre]
+        t0 = time.perf_counter()
+        df = con_reintentos(lambda: fuente.extraer(marcas.get(nombre), timeout=timeout, limite=limite),
+                            intentos, espera_base)
+        return df, time.perf_counter() - t0
+
+    with ThreadPoolExecutor(max_workers=max_hilos or len(fuentes),
+                            thread_name_prefix="etl-extraccion") as pool:
+        futuros = {nombre: pool.submit(extraer, nombre) for nombre in fuentes}
+        resultados = {nombre: futuro.result() for nombre, futuro in futuros.items()}
+
+    return ({nombre: df for nombre, (df, _) in resultados.items()},
+            {nombre: segundos for nombre, (_, segundos) in resultados.items()})
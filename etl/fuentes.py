@@ -0,0 +1,225 @@
+"""
+Sistemas origen simulados (TUIO, ARTEMISA y CORE SENDA) sobre SQLite.
+
+Cada fuente es una tabla con clave ``(fecha, agente_id)`` y una columna
+``fecha_modificacion`` indexada, igual que las réplicas de lectura de los
+sistemas reales: la extracción incremental pide solo las filas con
+``fecha_modificacion`` posterior a la marca de agua. Así el ETL se puede
+ejecutar y medir sin conexión a los sistemas de ASISA; ``latencia`` simula
+el tiempo de red de cada sistema para medir la extracción concurrente.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from kpis.almacen import RUTA_ALMACEN
+from kpis.generador import generar
+
+# Ficheros SQLite de las fuentes (configurable con ASISA_FUENTES)
+RUTA_FUENTES = Path(os.environ.get("ASISA_FUENTES", RUTA_ALMACEN.parent / "fuentes"))
+
+# Fuente -> (tabla, {columna: tipo SQL}); entre las tres cubren COMPONENTES
+TABLAS_FUENTE = {
+    'artemisa': ('llamadas', {
+        'llamadas_totales': 'INTEGER',
+        'llamadas_atendidas': 'INTEGER',
+        'llamadas_en_umbral': 'INTEGER',
+        'llamadas_abandonadas': 'INTEGER',
+        'minutos_tmo': 'REAL',
+        'minutos_tma': 'REAL',
+    }),
+    'tuio': ('presupuestos', {'presupuestos': 'INTEGER'}),
+    'core_senda': ('polizas', {'polizas_vendidas': 'INTEGER'}),
+}
+
+FORMATO_FECHA = '%Y-%m-%d %H:%M:%S'
+
+
+def marca_tiempo(instante=None):
+    """``fecha_modificacion`` en texto ISO con microsegundos (ordenable)"""
+    return (instante or datetime.now()).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+class PoolConexiones:
+    """Conexiones reutilizables a una fuente, como máximo ``tamano`` abiertas"""
+
+    def __init__(self, ruta, tamano=2, espera=30.0):
+        self.ruta = ruta
+        self.tamano = tamano
+        self.espera = espera
+        self._libres = queue.LifoQueue()
+        self._abiertas = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def conexion(self):
+        """Conexión en transacción (commit al salir, rollback si hay error)"""
+        try:
+            con = self._libres.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                nueva = self._abiertas < self.tamano
+                self._abiertas += nueva
+            con = (sqlite3.connect(self.ruta, timeout=self.espera, check_same_thread=False)
+                   if nueva else self._libres.get(timeout=self.espera))
+        try:
+            with con:
+                yield con
+        finally:
+            self._libres.put(con)
+
+    def cerrar(self):
+        while True:
+            try:
+                self._libres.get_nowait().close()
+            except queue.Empty:
+                break
+            with self._lock:
+                self._abiertas -= 1
+
+
+class FuenteSQLite:
+    """Tabla de un sistema origen con extracción por ``fecha_modificacion``"""
+
+    def __init__(self, nombre, ruta, tabla, columnas, latencia=0.0, conexiones=2):
+        self.nombre = nombre
+        self.ruta = Path(ruta)
+        self.tabla = tabla
+        self.columnas = dict(columnas)
+        self.latencia = latencia
+        self.pool = PoolConexiones(self.ruta, conexiones)
+
+    def _conectar(self):
+        return self.pool.conexion()
+
+    def crear(self):
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        definicion = ", ".join(f"{c} {t} NOT NULL" for c, t in self.columnas.items())
+        with self._conectar() as con:
+            con.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.tabla} ("
+                f"fecha TEXT NOT NULL, agente_id TEXT NOT NULL, {definicion}, "
+                f"fecha_modificacion TEXT NOT NULL, PRIMARY KEY (fecha, agente_id))"
+            )
+            # Índice en el orden de la paginación por marca de agua
+            con.execute(
+                f"CREATE INDEX IF NOT EXISTS ix_{self.tabla}_marca "
+                f"ON {self.tabla} (fecha_modificacion, fecha, agente_id)"
+            )
+        return self
+
+    def publicar(self, df, modificado=None):
+        """Inserta o reemplaza filas (lo que haría el sistema origen al registrar actividad)"""
+        columnas = ['fecha', 'agente_id', *self.columnas]
+        filas = df[columnas].assign(
+            fecha=pd.to_datetime(df['fecha']).dt.strftime(FORMATO_FECHA),
+            agente_id=df['agente_id'].astype(str),
+            fecha_modificacion=marca_tiempo(modificado),
+        )
+        marcadores = ", ".join("?" * (len(columnas) + 1))
+        with self._conectar() as con:
+            con.executemany(
+                f"INSERT OR REPLACE INTO {self.tabla} "
+                f"({', '.join(columnas)}, fecha_modificacion) VALUES ({marcadores})",
+                filas.itertuples(index=False, name=None)
+            )
+        return len(filas)
+
+    def extraer(self, desde=None, timeout=None, limite=None):
+        """
+        Filas modificadas después de la marca ``desde`` (todas si es None).
+
+        La marca es ``(fecha_modificacion, fecha, agente_id)`` de la última
+        fila cargada: las filas se recorren en ese orden, así que con
+        ``limite`` se puede paginar sin perder filas que comparten
+        ``fecha_modificacion``. Con ``timeout`` (segundos) la consulta se
+        interrumpe al agotarlo y se lanza ``TimeoutError``.
+        """
+        limite_tiempo = time.monotonic() + timeout if timeout is not None else None
+        consulta = f"SELECT fecha, agente_id, {', '.join(self.columnas)}, fecha_modificacion FROM {self.tabla}"
+        parametros = ()
+        if desde is not None:
+            consulta += " WHERE (fecha_modificacion, fecha, agente_id) > (?, ?, ?)"
+            parametros = tuple(desde)
+        consulta += " ORDER BY fecha_modificacion, fecha, agente_id"
+        if limite is not None:
+            consulta += f" LIMIT {int(limite)}"
+
+        # Ida y vuelta de red simulada
+        if self.latencia:
+            espera = self.latencia if limite_tiempo is None else min(self.latencia, limite_tiempo - time.monotonic())
+            time.sleep(max(0.0, espera))
+        if limite_tiempo is not None and time.monotonic() >= limite_tiempo:
+            raise TimeoutError(f"{self.nombre}: sin respuesta en {timeout}s")
+
+        with self._conectar() as con:
+            if limite_tiempo is not None:
+                # SQLite consulta el manejador cada N instrucciones; != 0 aborta
+                con.set_progress_handler(lambda: time.monotonic() >= limite_tiempo, 10_000)
+            try:
+                df = pd.read_sql_query(consulta, con, params=parametros)
+            except sqlite3.OperationalError as error:
+                if limite_tiempo is not None and time.monotonic() >= limite_tiempo:
+                    raise TimeoutError(f"{self.nombre}: consulta interrumpida a los {timeout}s") from error
+                raise
+            finally:
+                con.set_progress_handler(None, 0)
+        return df.assign(fecha=pd.to_datetime(df['fecha'], format=FORMATO_FECHA))
+
+    def leer_claves(self, claves):
+        """Estado actual de las filas con esas ``(fecha, agente_id)`` (para reintentos)"""
+        columnas = ", ".join(f"t.{c}" for c in self.columnas)
+        valores = zip(pd.to_datetime(claves['fecha']).dt.strftime(FORMATO_FECHA), claves['agente_id'].astype(str))
+        with self._conectar() as con:
+            con.execute("CREATE TEMP TABLE IF NOT EXISTS claves_buscadas (fecha TEXT, agente_id TEXT)")
+            con.execute("DELETE FROM claves_buscadas")
+            con.executemany("INSERT INTO claves_buscadas VALUES (?, ?)", valores)
+            df = pd.read_sql_query(
+                f"SELECT t.fecha, t.agente_id, {columnas}, t.fecha_modificacion "
+                f"FROM {self.tabla} t JOIN claves_buscadas USING (fecha, agente_id)", con
+            )
+        return df.assign(fecha=pd.to_datetime(df['fecha'], format=FORMATO_FECHA))
+
+    @staticmethod
+    def marca(df):
+        """Marca de agua de la última fila de una extracción ordenada"""
+        ultima = df.iloc[-1]
+        return [ultima['fecha_modificacion'], ultima['fecha'].strftime(FORMATO_FECHA), ultima['agente_id']]
+
+
+def crear_fuentes(ruta=RUTA_FUENTES, latencias=None):
+    """Las tres fuentes, una base SQLite por sistema (``latencias``: segundos por fuente)"""
+    ruta = Path(ruta)
+    latencias = latencias or {}
+    return {
+        nombre: FuenteSQLite(nombre, ruta / f"{nombre}.db", tabla, columnas,
+                             latencia=latencias.get(nombre, 0.0)).crear()
+        for nombre, (tabla, columnas) in TABLAS_FUENTE.items()
+    }
+
+
+def simular_actividad(fuentes, fecha_inicio, fecha_fin, agentes, intervalo='30min',
+                      semilla=0, modificado=None):
+    """
+    Publica en las fuentes la actividad generada entre dos fechas.
+
+    Cada sistema recibe solo sus columnas de las filas por intervalo del
+    generador con inicio en ``[fecha_inicio, fecha_fin)``; devuelve las
+    filas por intervalo publicadas.
+    """
+    ini, fin = pd.Timestamp(fecha_inicio), pd.Timestamp(fecha_fin)
+    filas = 0
+    for df in generar(ini, fin, agentes, intervalo, 'intervalo', semilla):
+        df = df[(df['fecha'] >= ini) & (df['fecha'] < fin)]
+        for fuente in fuentes.values():
+            fuente.publicar(df, modificado)
+        filas += len(df)
+    return filas
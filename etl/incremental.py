@@ -0,0 +1,307 @@
+"""
+ETL incremental de las fuentes al almacén de KPIs.
+
+Cada ciclo (cada 30 minutos en producción) extrae a la vez de TUIO,
+ARTEMISA y CORE SENDA solo las filas con ``fecha_modificacion`` posterior
+a la marca de agua de cada fuente, las consolida por ``(fecha, agente_id)``
+y hace upsert en el almacén de intervalos (``datos_consolidados``) y, si
+hay ``destino``, en la tabla SQL ``datos_consolidados`` por lotes. Después
+recalcula solo las celdas (día, vertical, agente) tocadas del diario
+(``kpis_precalculados``) y sus padres semanal y mensual (``Rollups``). Con un ``IndiceHashes`` las
+filas reemitidas sin cambios de contenido se descartan antes de cargar, y
+las que no pasan ``validar_calidad`` se apartan a cuarentena.
+
+Tras una caída el atraso se procesa en lotes de como mucho ``tamano_lote``
+filas por fuente, así que la memoria no crece con las horas pendientes. La
+marca de agua se guarda al terminar cada lote: un lote que falla se repite
+entero en el siguiente ciclo y, como las cargas son upserts por clave,
+repetirlo no duplica nada.
+
+Uso:
+    python -m etl.incremental [--simular-desde 2024-06-01 --simular-hasta 2024-06-02]
+                              [--destino datos/etl/consolidados.db | postgresql://...]
+"""
+
+import argparse
+import json
+import os
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from kpis.almacen import RUTA_ALMACEN, AlmacenKPI
+from kpis.componentes import COMPONENTES
+from kpis.intervalos import COLUMNAS_INTERVALO, RUTA_INTERVALOS
+from etl.calidad import REGLAS, Cuarentena, validar_calidad
+from etl.cambios import IndiceHashes
+from etl.carga import TAMANO_LOTE, abrir_destino, cargar_por_lotes
+from etl.extraccion import extraer_fuentes
+from etl.fuentes import RUTA_FUENTES, FuenteSQLite, crear_fuentes
+from etl.rollups import RUTA_ROLLUPS, Rollups
+
+# Estado del ETL: marcas de agua (configurable con ASISA_ETL)
+RUTA_ETL = Path(os.environ.get("ASISA_ETL", RUTA_ALMACEN.parent / "etl"))
+
+CLAVES = ('fecha', 'agente_id')
+
+
+class MarcaAgua:
+    """Última ``fecha_modificacion`` cargada de cada fuente, persistida en JSON"""
+
+    def __init__(self, ruta=RUTA_ETL / "estado.json"):
+        self.ruta = Path(ruta)
+
+    def leer(self):
+        if not self.ruta.exists():
+            return {}
+        return json.loads(self.ruta.read_text(encoding="utf-8"))
+
+    def guardar(self, marcas):
+        # Escritura atómica: un ciclo interrumpido no deja el estado a medias
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        temporal = self.ruta.with_suffix(".tmp")
+        temporal.write_text(json.dumps(marcas, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(temporal, self.ruta)
+
+
+class ETLIncremental:
+    """Extracción por marca de agua, consolidación y upsert en los almacenes"""
+
+    def __init__(self, fuentes, almacen, almacen_intervalos, marca_agua, max_hilos=None,
+                 destino=None, tamano_lote=TAMANO_LOTE, hashes=None, cuarentena=None,
+                 reglas=REGLAS, rollups=None):
+        self.fuentes = fuentes
+        self.almacen = almacen
+        self.almacen_intervalos = almacen_intervalos
+        self.marca_agua = marca_agua
+        self.max_hilos = max_hilos
+        self.destino = destino
+        self.tamano_lote = tamano_lote
+        self.hashes = hashes
+        self.cuarentena = cuarentena
+        self.reglas = reglas
+        self.rollups = rollups if rollups is not None else Rollups(almacen, almacen_intervalos)
+
+    def extraer(self, marcas):
+        """DataFrame y segundos por fuente, extraídas en paralelo"""
+        return extraer_fuentes(self.fuentes, marcas, self.max_hilos, limite=self.tamano_lote)
+
+    def con_pendientes(self, extraidos, pendientes):
+        """Añade a lo extraído el estado actual de las claves en cuarentena"""
+        if pendientes.empty:
+            return extraidos
+        resultado = {}
+        for nombre, df in extraidos.items():
+            # Sin concatenar frames vacíos (sus columnas son object y contaminan los tipos)
+            partes = [p for p in (df, self.fuentes[nombre].leer_claves(pendientes)) if not p.empty]
+            resultado[nombre] = pd.concat(partes, ignore_index=True).drop_duplicates(list(CLAVES)) \
+                if partes else df
+        return resultado
+
+    @staticmethod
+    def claves(extraidos):
+        """``(fecha, agente_id)`` distintas de lo extraído de todas las fuentes"""
+        partes = [df[list(CLAVES)].astype({'agente_id': str}) for df in extraidos.values() if not df.empty]
+        if not partes:
+            return pd.DataFrame({'fecha': pd.Series(dtype='datetime64[ns]'),
+                                 'agente_id': pd.Series(dtype=object)})
+        return pd.concat(partes, ignore_index=True).drop_duplicates(ignore_index=True)
+
+    def descartar_sin_cambios(self, extraidos):
+        """Filas cuyo contenido difiere del último cargado (todas si no hay índice de hashes)"""
+        if self.hashes is None:
+            return extraidos
+        return {nombre: self.hashes.filtrar_cambiados(nombre, df, self.fuentes[nombre].columnas)
+                for nombre, df in extraidos.items()}
+
+    def transformar(self, extraidos, agentes):
+        """
+        Une las columnas de cada fuente por ``(fecha, agente_id)`` y añade la
+        vertical del catálogo. Las columnas que no trae ninguna fuente en
+        este ciclo quedan a NaN ("sin cambios" para el upsert parcial). Los
+        agentes fuera del catálogo quedan sin vertical y la validación los
+        aparta a cuarentena (regla ``agente_conocido``) hasta que se den de alta.
+        """
+        partes = [df.drop(columns=['fecha_modificacion', 'hash'], errors='ignore').set_index(list(CLAVES))
+                  for df in extraidos.values() if not df.empty]
+        if not partes:
+            return pd.DataFrame(columns=COLUMNAS_INTERVALO)
+
+        consolidado = pd.concat(partes, axis=1, join='outer').reset_index()
+        consolidado = consolidado.reindex(columns=[*CLAVES, *COMPONENTES])
+        vertical = consolidado['agente_id'].map(agentes.set_index('agente_id')['vertical'])
+        return consolidado.assign(vertical=vertical.astype(object))[COLUMNAS_INTERVALO]
+
+    def cargar(self, consolidado):
+        """Upsert de intervalos en el almacén y, si hay, en el destino SQL; devuelve segundos SQL"""
+        if consolidado.empty:
+            return 0.0
+        self.almacen_intervalos.actualizar(consolidado, CLAVES, parcial=True)
+        if self.destino is None:
+            return 0.0
+        return cargar_por_lotes(self.destino, consolidado, self.tamano_lote)['segundos']
+
+    def ejecutar(self, max_lotes=None):
+        """
+        Un ciclo: todos los lotes pendientes o, con ``max_lotes``, como mucho
+        esos (el resto queda para el siguiente ciclo: ``pendiente=True``).
+        Devuelve filas y segundos por etapa.
+        """
+        etapas = ('extraccion', 'deteccion_cambios', 'transformacion', 'validacion', 'carga',
+                  'rollup') + (('carga_sql',) if self.destino else ())
+        tiempos = dict.fromkeys(etapas, 0.0)
+        tiempos_fuente = dict.fromkeys(self.fuentes, 0.0)
+        filas_extraidas = dict.fromkeys(self.fuentes, 0)
+        filas_consolidadas = filas_sin_cambios = filas_cuarentena = n_lotes = 0
+        celdas = {}
+        calidad = {regla.nombre: {'fallos': 0, 'segundos': 0.0} for regla in self.reglas}
+        agentes = self.almacen.leer_dimension('agentes')
+        marcas = self.marca_agua.leer()
+        pendientes = self.cuarentena.pendientes() if self.cuarentena is not None else None
+
+        while True:
+            t0 = time.perf_counter()
+            extraidos, segundos = self.extraer(marcas)
+            tiempos['extraccion'] += time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            if pendientes is not None:
+                # Las claves en cuarentena se reintentan una vez por ciclo
+                extraidos_lote, pendientes = self.con_pendientes(extraidos, pendientes), None
+            else:
+                extraidos_lote = extraidos
+            tiempos['extraccion'] += time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            # Claves revisadas en el lote, antes de descartar las que no cambian:
+            # una clave en cuarentena que la fuente devuelve al contenido ya
+            # cargado no llega a validarse, pero también deja de estar pendiente
+            revisadas = self.claves(extraidos_lote)
+            cambiados = self.descartar_sin_cambios(extraidos_lote)
+            tiempos['deteccion_cambios'] += time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            consolidado = self.transformar(cambiados, agentes)
+            tiempos['transformacion'] += time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            # Las reglas se aplican a las filas tal como quedarán guardadas: los
+            # componentes que no trae el lote (los de otra fuente, o sin cambios)
+            # se toman del almacén, así las reglas entre fuentes siempre se evalúan
+            consolidado = self.almacen_intervalos.completar(consolidado, CLAVES)
+            consolidado, rechazadas, informe = validar_calidad(consolidado, self.reglas)
+            if self.cuarentena is not None:
+                self.cuarentena.actualizar(revisadas, rechazadas)
+            tiempos['validacion'] += time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            segundos_sql = self.cargar(consolidado)
+            tiempos['carga'] += time.perf_counter() - t0
+            if self.destino is not None:
+                tiempos['carga_sql'] += segundos_sql
+
+            t0 = time.perf_counter()
+            for granularidad, n in self.rollups.recalcular(consolidado).items():
+                celdas[granularidad] = celdas.get(granularidad, 0) + n
+            tiempos['rollup'] += time.perf_counter() - t0
+
+            if self.hashes is not None:
+                t0 = time.perf_counter()
+                # Las filas en cuarentena no cuentan como cargadas
+                apartadas = pd.MultiIndex.from_frame(rechazadas[list(CLAVES)].astype({'agente_id': str}))
+                for nombre, df in cambiados.items():
+                    self.hashes.registrar(nombre, df[~pd.MultiIndex.from_frame(df[list(CLAVES)]).isin(apartadas)])
+                tiempos['deteccion_cambios'] += time.perf_counter() - t0
+
+            # La marca avanza solo cuando el lote está cargado
+            nuevas = {nombre: FuenteSQLite.marca(df) for nombre, df in extraidos.items() if not df.empty}
+            if nuevas:
+                marcas = {**marcas, **nuevas}
+                self.marca_agua.guardar(marcas)
+
+            for nombre, df in extraidos.items():
+                filas_extraidas[nombre] += len(df)
+                filas_sin_cambios += len(extraidos_lote[nombre]) - len(cambiados[nombre])
+                tiempos_fuente[nombre] += segundos[nombre]
+            filas_consolidadas += len(consolidado)
+            filas_cuarentena += len(rechazadas)
+            for nombre, medida in informe.items():
+                calidad[nombre]['fallos'] += medida['fallos']
+                calidad[nombre]['segundos'] += medida['segundos']
+            n_lotes += 1
+
+            # Una fuente con el lote lleno puede tener más filas pendientes
+            pendiente = any(len(df) >= self.tamano_lote for df in extraidos.values())
+            if not pendiente or (max_lotes is not None and n_lotes >= max_lotes):
+                break
+
+        # carga_sql ya está incluida en carga
+        total = sum(t for etapa, t in tiempos.items() if etapa != 'carga_sql')
+        return {
+            'filas_extraidas': filas_extraidas,
+            'filas_consolidadas': filas_consolidadas,
+            'filas_diarias': celdas.get("Día", 0),
+            'celdas_recalculadas': celdas,
+            'filas_sin_cambios': filas_sin_cambios,
+            'filas_cuarentena': filas_cuarentena,
+            'lotes': n_lotes,
+            'pendiente': pendiente,
+            'filas_por_segundo': filas_consolidadas / total if total else 0.0,
+            'tiempos': tiempos,
+            'tiempos_fuente': tiempos_fuente,
+            'calidad': calidad,
+        }
+
+
+def etl_incremental(fuentes=None, almacen=None, almacen_intervalos=None, marca_agua=None,
+                    destino=None, tamano_lote=TAMANO_LOTE, max_lotes=None):
+    """
+    Ejecuta un ciclo del ETL con las rutas por defecto de cada pieza.
+    ``destino`` es un objeto destino o una URL/ruta para ``abrir_destino``.
+    """
+    if isinstance(destino, (str, Path)):
+        destino = abrir_destino(str(destino))
+    if almacen is None:
+        almacen = AlmacenKPI()
+    if almacen_intervalos is None:
+        almacen_intervalos = AlmacenKPI(RUTA_INTERVALOS, particion='dia')
+    etl = ETLIncremental(
+        fuentes if fuentes is not None else crear_fuentes(RUTA_FUENTES),
+        almacen,
+        almacen_intervalos,
+        marca_agua if marca_agua is not None else MarcaAgua(),
+        destino=destino,
+        tamano_lote=tamano_lote,
+        # Índice de hashes junto a la tabla de intervalos ("_" = fuera del dataset)
+        hashes=IndiceHashes(almacen_intervalos.ruta / "_hashes"),
+        cuarentena=Cuarentena(RUTA_ETL / "cuarentena"),
+        rollups=Rollups(almacen, almacen_intervalos, RUTA_ROLLUPS),
+    )
+    return etl.ejecutar(max_lotes)
+
+
+def main():
+    from etl.fuentes import simular_actividad
+
+    parser = argparse.ArgumentParser(description="Ciclo del ETL incremental")
+    parser.add_argument('--simular-desde', help="publica actividad sintética en las fuentes antes del ciclo")
+    parser.add_argument('--simular-hasta')
+    parser.add_argument('--destino', help="tabla datos_consolidados: ruta SQLite o URL postgresql://")
+    parser.add_argument('--lote', type=int, default=TAMANO_LOTE, help="filas por lote y fuente")
+    args = parser.parse_args()
+
+    if args.simular_desde:
+        fuentes = crear_fuentes(RUTA_FUENTES)
+        agentes = AlmacenKPI().leer_dimension('agentes')
+        simular_actividad(fuentes, args.simular_desde, args.simular_hasta or pd.Timestamp.now(), agentes)
+
+    resumen = etl_incremental(destino=args.destino, tamano_lote=args.lote)
+    tiempos = ", ".join(f"{etapa} {seg:.2f}s" for etapa, seg in resumen['tiempos'].items())
+    print(f"✅ {resumen['filas_consolidadas']:,} intervalos y {resumen['filas_diarias']:,} "
+          f"filas diarias cargadas en {resumen['lotes']} lotes "
+          f"({resumen['filas_por_segundo']:,.0f} filas/s; {tiempos})")
+
+
+if __name__ == '__main__':
+    main()
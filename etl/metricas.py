@@ -0,0 +1,43 @@
+"""
+Fichero de métricas del ETL: una línea JSON por ejecución del planificador
+(segundos por etapa y filas). Sin dependencias de plataforma para que el
+dashboard pueda leerlo en cualquier sistema.
+"""
+
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from etl.incremental import RUTA_ETL
+
+# Registros que se conservan en el fichero de métricas
+MAX_REGISTROS = 500
+
+RUTA_METRICAS = RUTA_ETL / "metricas.jsonl"
+
+
+def registrar_metricas(registro, ruta=RUTA_METRICAS, max_registros=MAX_REGISTROS):
+    """Añade un registro JSON al fichero de métricas conservando los últimos ``max_registros``"""
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    lineas = ruta.read_text(encoding="utf-8").splitlines() if ruta.exists() else []
+    lineas = (lineas + [json.dumps(registro, ensure_ascii=False)])[-max_registros:]
+    # Temporal propio de cada escritor: dos procesos nunca comparten el fichero a medio escribir
+    descriptor, temporal = tempfile.mkstemp(dir=ruta.parent, prefix=f"{ruta.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(descriptor, "w", encoding="utf-8") as fichero:
+            fichero.write("\n".join(lineas) + "\n")
+        os.replace(temporal, ruta)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+
+
+def leer_metricas(ruta=RUTA_METRICAS, n=None):
+    """Últimos ``n`` registros de ejecución (todos si es None), del más antiguo al más reciente"""
+    ruta = Path(ruta)
+    if not ruta.exists():
+        return []
+    registros = [json.loads(linea) for linea in ruta.read_text(encoding="utf-8").splitlines() if linea]
+    return registros[-n:] if n else registros
@@ -0,0 +1,192 @@
+"""
+Planificador del ETL dentro del propio proceso (sin cron ni Airflow).
+
+Lanza ``etl_incremental`` cada ``cadencia`` minutos. Un cerrojo ``flock``
+sobre un fichero impide que dos ejecuciones se solapen, aunque vengan de
+procesos distintos (varias réplicas del dashboard, un lanzamiento manual). Tras una parada los
+ciclos perdidos no se repiten uno a uno: se hace un único ciclo y cada
+ciclo procesa como mucho ``max_lotes`` lotes, de modo que el atraso se
+recupera en trozos acotados. Cada ejecución deja una línea en el fichero
+de métricas (``etl.metricas``) que lee el dashboard. El cerrojo usa
+``fcntl``, así que el planificador solo funciona en sistemas POSIX.
+
+Uso:
+    python -m etl.planificador [--cadencia 30] [--ciclos 1]
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from etl.incremental import RUTA_ETL, etl_incremental
+from etl.metricas import RUTA_METRICAS, registrar_metricas
+
+# Minutos entre ciclos
+CADENCIA = 30
+
+# Lotes por ciclo como máximo (acota la recuperación tras una parada)
+MAX_LOTES_POR_CICLO = 20
+
+class CerrojoETL:
+    """
+    Cerrojo exclusivo (``fcntl.flock``) sobre un fichero que no se borra.
+
+    El sistema operativo lo suelta si el proceso dueño muere, así que no
+    hay cerrojos abandonados que detectar ni romper. El fichero guarda el
+    pid y la hora del dueño actual solo como información.
+    """
+
+    def __init__(self, ruta=RUTA_ETL / "etl.lock"):
+        self.ruta = Path(ruta)
+        self._fichero = None
+
+    def adquirir(self, esperar=False):
+        """True si se obtiene el cerrojo; False si otra ejecución lo tiene (con ``esperar``, espera a que lo suelte)"""
+        if self._fichero is not None:
+            return False
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        fichero = open(self.ruta, "a+", encoding="utf-8")
+        try:
+            fcntl.flock(fichero, fcntl.LOCK_EX if esperar else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            fichero.close()
+            return False
+        fichero.truncate(0)
+        fichero.write(json.dumps({'pid': os.getpid(), 'desde': time.time()}))
+        fichero.flush()
+        self._fichero = fichero
+        return True
+
+    def liberar(self):
+        # Sin unlink: otro proceso puede estar ya esperando sobre este fichero
+        if self._fichero is not None:
+            fcntl.flock(self._fichero, fcntl.LOCK_UN)
+            self._fichero.close()
+            self._fichero = None
+
+    @contextmanager
+    def retener(self, esperar=False):
+        """``with cerrojo.retener() as obtenido:`` (no espera si está ocupado salvo con ``esperar``)"""
+        obtenido = self.adquirir(esperar)
+        try:
+            yield obtenido
+        finally:
+            if obtenido:
+                self.liberar()
+
+
+def _resumen_metricas(resumen):
+    """Segundos por etapa y recuentos de filas de un resumen del ETL"""
+    return {
+        'etapas': resumen['tiempos'],
+        'filas': {
+            'extraidas': sum(resumen['filas_extraidas'].values()),
+            'sin_cambios': resumen['filas_sin_cambios'],
+            'cuarentena': resumen['filas_cuarentena'],
+            'cargadas': resumen['filas_consolidadas'],
+            'celdas_recalculadas': resumen['celdas_recalculadas'],
+        },
+        'lotes': resumen['lotes'],
+        'pendiente': resumen['pendiente'],
+        'filas_por_segundo': resumen['filas_por_segundo'],
+    }
+
+
+class Planificador:
+    """Ejecuta ``tarea`` cada ``cadencia`` minutos sin solapes y registra métricas"""
+
+    def __init__(self, tarea=etl_incremental, cadencia=CADENCIA, max_lotes=MAX_LOTES_POR_CICLO,
+                 cerrojo=None, ruta_metricas=RUTA_METRICAS):
+        self.tarea = tarea
+        self.cadencia = timedelta(minutes=cadencia)
+        self.max_lotes = max_lotes
+        self.cerrojo = cerrojo if cerrojo is not None else CerrojoETL()
+        self.ruta_metricas = Path(ruta_metricas)
+        # Serializa las escrituras de métricas de todas las réplicas (también las de ciclos omitidos)
+        self.cerrojo_metricas = CerrojoETL(self.ruta_metricas.with_suffix(".lock"))
+        self.ultimo_inicio = None
+
+    def _registrar(self, registro):
+        with self.cerrojo_metricas.retener(esperar=True):
+            registrar_metricas(registro, self.ruta_metricas)
+
+    def ejecutar_ciclo(self):
+        """Un ciclo protegido por el cerrojo; devuelve el registro de métricas"""
+        inicio = datetime.now()
+        registro = {'inicio': inicio.isoformat(timespec='seconds')}
+        self.ultimo_inicio = inicio
+        with self.cerrojo.retener() as obtenido:
+            if not obtenido:
+                registro['estado'] = 'omitido'
+            else:
+                t0 = time.perf_counter()
+                try:
+                    resumen = self.tarea(max_lotes=self.max_lotes)
+                except Exception as error:
+                    registro.update(estado='error', error=f"{type(error).__name__}: {error}")
+                else:
+                    registro.update(estado='ok', **_resumen_metricas(resumen))
+                registro['segundos'] = time.perf_counter() - t0
+                # Aún con el cerrojo: el ciclo siguiente ya encuentra este registro
+                self._registrar(registro)
+        if not obtenido:
+            self._registrar(registro)
+        return registro
+
+    def proximo(self, ahora=None):
+        """
+        Hora del siguiente ciclo. Si la parada se ha comido uno o más ciclos
+        se ejecuta uno ya; si el anterior dejó atraso pendiente, también.
+        """
+        ahora = ahora or datetime.now()
+        if self.ultimo_inicio is None:
+            return ahora
+        return max(ahora, self.ultimo_inicio + self.cadencia)
+
+    def iniciar(self, ciclos=None, detener=None):
+        """Bucle del planificador (``ciclos`` ejecuciones o hasta ``detener.set()``)"""
+        detener = detener or threading.Event()
+        hechos = 0
+        while not detener.is_set() and (ciclos is None or hechos < ciclos):
+            espera = (self.proximo() - datetime.now()).total_seconds()
+            if espera > 0 and detener.wait(espera):
+                break
+            try:
+                registro = self.ejecutar_ciclo()
+            except Exception:
+                # Fallos fuera de la tarea (métricas, disco): se informa y el hilo
+                # sigue; el próximo ciclo llega con la cadencia normal
+                traceback.print_exc()
+                registro = {}
+            hechos += 1
+            if registro.get('pendiente'):
+                # Atraso por recuperar: el siguiente lote acotado sin esperar la cadencia
+                self.ultimo_inicio -= self.cadencia
+
+    def en_segundo_plano(self):
+        """Arranca el bucle en un hilo daemon; devuelve el evento para detenerlo"""
+        detener = threading.Event()
+        threading.Thread(target=self.iniciar, kwargs={'detener': detener},
+                         name="etl-planificador", daemon=True).start()
+        return detener
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Planificador del ETL incremental")
+    parser.add_argument('--cadencia', type=float, default=CADENCIA, help="minutos entre ciclos")
+    parser.add_argument('--max-lotes', type=int, default=MAX_LOTES_POR_CICLO)
+    parser.add_argument('--ciclos', type=int, help="número de ciclos (por defecto, sin fin)")
+    args = parser.parse_args()
+
+    Planificador(cadencia=args.cadencia, max_lotes=args.max_lotes).iniciar(ciclos=args.ciclos)
+
+
+if __name__ == '__main__':
+    main()
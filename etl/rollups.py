@@ -0,0 +1,98 @@
+"""
+Recálculo de agregados acotado a las celdas tocadas por cada lote.
+
+Cada lote del ETL toca un conjunto de celdas ``(día, vertical, agente)``.
+Solo esas celdas se recalculan desde los intervalos, y después solo sus
+padres: la semana ISO y el mes que las contienen, para esos mismos agentes.
+Se leen solo las particiones de esos periodos, con el filtro de agentes
+empujado al lector Parquet: una corrección tardía de un agente cuesta leer
+sus días, su semana y su mes, no reconstruir las tablas.
+
+Las tablas semanal y mensual se guardan como el diario (componentes
+aditivos por ``(inicio del periodo, vertical, agente)``; los KPIs ratio se
+derivan al leer).
+"""
+
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from kpis.agregados import a_diario, fin_periodo, inicio_periodo
+from kpis.almacen import RUTA_ALMACEN, AlmacenKPI
+from kpis.componentes import COMPONENTES, combinar
+from kpis.dimensiones import categorizar
+from kpis.intervalos import COLUMNAS_INTERVALO
+
+# Tablas semanal y mensual, junto al diario (configurable con ASISA_ROLLUPS)
+RUTA_ROLLUPS = Path(os.environ.get("ASISA_ROLLUPS", RUTA_ALMACEN.parent / "rollups"))
+
+CLAVES = ('fecha', 'agente_id')
+CELDA = ['fecha', 'vertical', 'agente_id']
+
+
+def _en_celdas(df, celdas):
+    """Filas de ``df`` cuya (fecha, agente_id) es una de ``celdas``"""
+    indice = pd.MultiIndex.from_arrays([df['fecha'], df['agente_id'].astype(str)])
+    return df[indice.isin(pd.MultiIndex.from_arrays([celdas['fecha'], celdas['agente_id'].astype(str)]))]
+
+
+def agregar_celdas(df, granularidad):
+    """Suma de componentes por (inicio de periodo, vertical, agente)"""
+    tabla = combinar([df.assign(fecha=inicio_periodo(df['fecha'], granularidad))], claves=tuple(CELDA))
+    return categorizar(tabla[[*CELDA, *COMPONENTES]])
+
+
+class Rollups:
+    """Diario, semanal y mensual mantenidos celda a celda desde los intervalos"""
+
+    def __init__(self, almacen, almacen_intervalos, ruta=RUTA_ROLLUPS,
+                 granularidades=("Semana", "Mes")):
+        self.almacen = almacen
+        self.almacen_intervalos = almacen_intervalos
+        self.tablas = {g: AlmacenKPI(Path(ruta) / g.lower()) for g in granularidades}
+
+    def celdas(self, df, granularidad="Día"):
+        """Celdas (inicio de periodo, vertical, agente) que contienen las filas de ``df``"""
+        return df.assign(fecha=inicio_periodo(df['fecha'], granularidad))[CELDA] \
+            .astype({'vertical': str, 'agente_id': str}).drop_duplicates(ignore_index=True)
+
+    def _recalcular(self, origen, destino, celdas, granularidad, columnas):
+        """Vuelve a sumar desde ``origen`` las ``celdas`` de ``granularidad`` y las guarda en ``destino``"""
+        # Solo las particiones de los periodos tocados (no el rango entre el
+        # más antiguo y el actual) y, dentro, solo los agentes tocados
+        dias = pd.concat([pd.Series(pd.date_range(inicio, fin_periodo(inicio, granularidad)))
+                          for inicio in celdas['fecha'].unique()])
+        filas = origen.leer(columnas=columnas, particiones=origen.particiones(dias),
+                            filtros={'agente_id': celdas['agente_id'].unique().tolist()})
+        periodos = filas.assign(fecha=inicio_periodo(filas['fecha'], granularidad))
+        filas = filas.loc[_en_celdas(periodos, celdas).index]
+        tabla = a_diario(filas) if granularidad == "Día" else agregar_celdas(filas, granularidad)
+        destino.actualizar(tabla, CLAVES)
+        return tabla
+
+    def recalcular(self, tocados):
+        """
+        Recalcula las celdas de los intervalos ``tocados`` y sus padres
+        (día → semana ISO → mes). Devuelve el nº de celdas por granularidad.
+        """
+        if tocados.empty:
+            return {}
+        celdas = {"Día": self.celdas(tocados)}
+        self._recalcular(self.almacen_intervalos, self.almacen, celdas["Día"], "Día", COLUMNAS_INTERVALO)
+
+        for granularidad, tabla in self.tablas.items():
+            celdas[granularidad] = self.celdas(celdas["Día"], granularidad)
+            if tabla.existe():
+                self._recalcular(self.almacen, tabla, celdas[granularidad], granularidad,
+                                 [*CELDA, *COMPONENTES])
+            else:
+                # Primera vez: la tabla se construye entera desde el diario
+                self.reconstruir(granularidad)
+        return {granularidad: len(c) for granularidad, c in celdas.items()}
+
+    def reconstruir(self, granularidad):
+        """Tabla ``granularidad`` completa desde el diario"""
+        tabla = agregar_celdas(self.almacen.leer(columnas=[*CELDA, *COMPONENTES]), granularidad)
+        self.tablas[granularidad].escribir(tabla)
+        return len(tabla)
@@ -0,0 +1,40 @@
+"""
+Capa de datos de KPIs del Call Center ASISA.
+
+Módulos de almacenamiento, consulta y agregación que usa ``dashboard.py``.
+"""
+
+from kpis.acumulados import COMPARACIONES, AcumuladosKPI
+from kpis.agentes import kpis_por_agente, seleccionar_extremos
+from kpis.agregados import GRANULARIDADES, AgregadosKPI
+from kpis.almacen import AlmacenKPI
+from kpis.componentes import COMPONENTES, combinar, derivar_kpis
+from kpis.dimensiones import DIMENSIONES, TODOS, IndiceDimensiones
+from kpis.figuras import CacheFiguras
+from kpis.intervalos import perfil_intradia
+from kpis.registro import KPI, REGISTRO, RegistroKPI
+from kpis.serie import SerieTemporal
+from kpis.submuestreo import submuestrear
+
+__all__ = [
+    "COMPARACIONES",
+    "COMPONENTES",
+    "DIMENSIONES",
+    "GRANULARIDADES",
+    "REGISTRO",
+    "TODOS",
+    "KPI",
+    "AcumuladosKPI",
+    "AgregadosKPI",
+    "AlmacenKPI",
+    "CacheFiguras",
+    "IndiceDimensiones",
+    "RegistroKPI",
+    "SerieTemporal",
+    "combinar",
+    "derivar_kpis",
+    "kpis_por_agente",
+    "perfil_intradia",
+    "seleccionar_extremos",
+    "submuestrear",
+]
@@ -0,0 +1,95 @@
+"""
+Sumas acumuladas (prefix sums) de los componentes aditivos de los KPIs.
+
+Nivel de servicio, TMO, TMA, total de llamadas y tasa de conversión son
+cocientes de sumas. Guardando la suma acumulada de cada componente, los
+KPIs de cualquier rango de fechas salen de dos lecturas por componente
+(``acumulado[j] - acumulado[i]``) sin recorrer las filas del rango.
+"""
+
+import numpy as np
+import pandas as pd
+
+from kpis.componentes import COMPONENTES
+from kpis.registro import REGISTRO
+from kpis.serie import SerieTemporal
+
+
+def kpis_desde_sumas(sumas):
+    """KPIs de las tarjetas a partir de las sumas de los componentes"""
+    kpis = {nombre: float(valor) for nombre, valor in REGISTRO.evaluar(sumas).items()}
+    kpis['total_llamadas'] = int(sumas['llamadas_totales'])
+    return kpis
+
+
+# Ventanas con las que se comparan las tarjetas de KPIs
+COMPARACIONES = ['Periodo anterior', 'Mes anterior', 'Año anterior']
+
+
+def ventanas_comparacion(fecha_inicio, fecha_fin):
+    """Ventanas equivalentes anteriores al rango [fecha_inicio, fecha_fin]"""
+    ini = pd.Timestamp(fecha_inicio).normalize()
+    fin = pd.Timestamp(fecha_fin).normalize()
+    duracion = fin - ini + pd.Timedelta(days=1)
+    return {
+        'Periodo anterior': (ini - duracion, ini - pd.Timedelta(days=1)),
+        'Mes anterior': (ini - pd.DateOffset(months=1), fin - pd.DateOffset(months=1)),
+        'Año anterior': (ini - pd.DateOffset(years=1), fin - pd.DateOffset(years=1)),
+    }
+
+
+def inicio_comparaciones(fecha_inicio, fecha_fin):
+    """Primera fecha que hace falta cargar para calcular todas las comparaciones"""
+    return min(ini for ini, _ in ventanas_comparacion(fecha_inicio, fecha_fin).values())
+
+
+class AcumuladosKPI:
+    """
+    Sumas acumuladas por fila de la serie ordenada por fecha.
+
+    ``desde`` es la primera fecha con datos (por defecto, la primera de la
+    serie): antes no hay datos, no ceros, y una ventana que empiece antes
+    no se puede comparar.
+    """
+
+    def __init__(self, serie, desde=None):
+        if not isinstance(serie, SerieTemporal):
+            serie = SerieTemporal(serie)
+        self.serie = serie
+        if desde is None and len(serie):
+            desde = serie.df[serie.columna].iloc[0]
+        self.desde = None if desde is None else pd.Timestamp(desde).normalize()
+        valores = serie.df[COMPONENTES].to_numpy(dtype=np.float64)
+        # Fila 0 a ceros: la suma de [i, j) es acumulado[j] - acumulado[i]
+        self._acumulado = np.zeros((len(valores) + 1, len(COMPONENTES)))
+        np.cumsum(valores, axis=0, out=self._acumulado[1:])
+
+    def sumas(self, fecha_inicio=None, fecha_fin=None):
+        """Suma de cada componente en [fecha_inicio, fecha_fin]"""
+        i, j = self.serie.indices(fecha_inicio, fecha_fin)
+        return dict(zip(COMPONENTES, self._acumulado[j] - self._acumulado[i]))
+
+    def kpis(self, fecha_inicio=None, fecha_fin=None):
+        """KPIs de las tarjetas para el rango, en O(log n)"""
+        return kpis_desde_sumas(self.sumas(fecha_inicio, fecha_fin))
+
+    def comparativa(self, fecha_inicio, fecha_fin):
+        """
+        KPIs del rango ('Actual') y de sus ventanas de comparación.
+
+        Todas las ventanas se resuelven en una sola pasada: una búsqueda
+        binaria vectorizada de los límites y una resta de filas acumuladas.
+        Las ventanas que empiezan antes de ``desde`` valen None (compararse
+        con datos parciales daría variaciones sin sentido).
+        """
+        ventanas = {'Actual': (fecha_inicio, fecha_fin),
+                    **ventanas_comparacion(fecha_inicio, fecha_fin)}
+        inicios, fines = zip(*ventanas.values())
+        i, j = self.serie.indices_ventanas(inicios, fines)
+        sumas = self._acumulado[j] - self._acumulado[i]
+        return {
+            nombre: kpis_desde_sumas(dict(zip(COMPONENTES, fila)))
+            if nombre == 'Actual' or (self.desde is not None and pd.Timestamp(ini) >= self.desde)
+            else None
+            for nombre, ini, fila in zip(ventanas, inicios, sumas)
+        }
@@ -0,0 +1,61 @@
+"""
+KPIs por agente y ranking parcial (top/bottom-K).
+
+Los KPIs de todos los agentes salen de una única agregación agrupada sobre
+las filas seleccionadas de la tabla de hechos. Para el ranking solo se
+ordenan los K agentes elegidos: ``argpartition`` los separa en O(n) y
+después se ordenan esos K.
+"""
+
+import numpy as np
+
+from kpis.componentes import COMPONENTES, derivar_kpis
+
+# Columnas del ranking tal como se muestran en el dashboard
+COLUMNAS_RANKING = {
+    'nombre': 'Agente',
+    'vertical': 'Vertical',
+    'llamadas_totales': 'Llamadas',
+    'nivel_servicio': 'Nivel Servicio',
+    'tmo': 'TMO',
+    'polizas_vendidas': 'Pólizas Vendidas',
+    'tasa_conversion': 'Tasa Conversión',
+}
+
+
+def kpis_por_agente(df, filas=None, agentes=None):
+    """
+    Componentes sumados y KPIs ratio por agente.
+
+    ``filas`` son posiciones de ``df`` (p. ej. de ``IndiceDimensiones.filas``);
+    ``agentes`` es el catálogo para añadir nombre y vertical.
+    """
+    if filas is not None:
+        df = df.iloc[filas]
+    tabla = derivar_kpis(
+        df.groupby('agente_id', observed=True, sort=False)[COMPONENTES].sum().reset_index()
+    )
+    tabla['agente_id'] = tabla['agente_id'].astype(str)
+    if agentes is not None:
+        tabla = tabla.merge(agentes, on='agente_id', how='left')
+    return tabla
+
+
+def seleccionar_extremos(tabla, columna, k, mejores=True):
+    """
+    Las ``k`` filas con mayor (``mejores``) o menor valor de ``columna``,
+    ya ordenadas. Los NaN quedan siempre al final.
+    """
+    valores = tabla[columna].to_numpy(dtype=np.float64)
+    clave = -valores if mejores else valores.copy()
+    clave[np.isnan(clave)] = np.inf
+
+    k = min(k, len(tabla))
+    if k == 0:
+        return tabla.iloc[:0]
+    if k < len(tabla):
+        candidatos = np.argpartition(clave, k - 1)[:k]
+    else:
+        candidatos = np.arange(len(tabla))
+    orden = candidatos[np.argsort(clave[candidatos], kind='stable')]
+    return tabla.iloc[orden]
@@ -0,0 +1,112 @@
+"""
+Agregados temporales (Día / Semana / Mes) precalculados por carga de datos.
+
+Las tablas semanal (semana ISO, empieza en lunes) y mensual se construyen
+una vez a partir de la serie diaria. Al consultar un rango solo se
+recalculan desde los datos diarios los periodos de los extremos que quedan
+cortados por ``fecha_inicio``/``fecha_fin``.
+"""
+
+import pandas as pd
+
+from kpis.componentes import COMPONENTES, combinar
+from kpis.dimensiones import categorizar
+from kpis.serie import SerieTemporal
+
+GRANULARIDADES = ["Día", "Semana", "Mes"]
+
+
+def inicio_periodo(fechas, granularidad):
+    """Fecha de inicio del periodo (día, lunes de la semana ISO o día 1 del mes)"""
+    fechas = pd.to_datetime(fechas)
+    if isinstance(fechas, pd.Timestamp):
+        fechas = pd.Series([fechas])
+        return inicio_periodo(fechas, granularidad).iloc[0]
+
+    dias = fechas.dt.normalize()
+    if granularidad == "Día":
+        return dias
+    if granularidad == "Semana":
+        return dias - pd.to_timedelta(dias.dt.weekday, unit="D")
+    if granularidad == "Mes":
+        return dias - pd.to_timedelta(dias.dt.day - 1, unit="D")
+    raise ValueError(f"Granularidad no soportada: {granularidad}")
+
+
+def agregar(df, granularidad):
+    """
+    Agrega ``df`` por periodo; ``fecha`` pasa a ser el inicio del periodo.
+
+    Se suman los componentes y los KPIs ratio se recalculan como cociente de
+    sumas, así que un agregado mensual es exacto se construya desde días o
+    desde semanas ya agregadas.
+    """
+    return combinar([df.assign(fecha=inicio_periodo(df['fecha'], granularidad))])
+
+
+def a_diario(df):
+    """Agrega filas por intervalo a una fila por (día, vertical, agente)"""
+    diario = combinar([df.assign(fecha=df['fecha'].dt.normalize())],
+                      claves=('fecha', 'vertical', 'agente_id'))
+    return categorizar(diario[['fecha', 'vertical', 'agente_id', *COMPONENTES]])
+
+
+class AgregadosKPI:
+    """
+    Serie diaria más sus agregados semanal y mensual ya calculados.
+
+    ``tablas`` ({granularidad: DataFrame por inicio de periodo}) son
+    agregados ya mantenidos fuera (los rollups del ETL); las granularidades
+    que falten se agregan desde el diario.
+    """
+
+    def __init__(self, df, tablas=None):
+        self.diario = SerieTemporal(df)
+        self.tablas = {"Día": self.diario}
+        for granularidad in GRANULARIDADES[1:]:
+            tabla = (tablas or {}).get(granularidad)
+            self.tablas[granularidad] = SerieTemporal(
+                agregar(self.diario.df, granularidad) if tabla is None else tabla
+            )
+
+    def rango(self, granularidad, fecha_inicio, fecha_fin):
+        """Tabla de ``granularidad`` restringida a [fecha_inicio, fecha_fin]"""
+        if granularidad == "Día":
+            return self.diario.rango(fecha_inicio, fecha_fin)
+
+        ini = pd.Timestamp(fecha_inicio).normalize()
+        fin = pd.Timestamp(fecha_fin).normalize()
+        p_ini = inicio_periodo(ini, granularidad)
+        p_fin = inicio_periodo(fin, granularidad)
+        corta_inicio = p_ini < ini
+        corta_fin = fin < fin_periodo(p_fin, granularidad)
+
+        # Un único periodo cortado: se agrega directamente desde los días
+        if p_ini == p_fin and (corta_inicio or corta_fin):
+            return agregar(self.diario.rango(ini, fin), granularidad)
+
+        # Periodos completos: desde la tabla precalculada
+        interior = self.tablas[granularidad].rango(
+            p_ini + pd.Timedelta(days=1) if corta_inicio else p_ini,
+            p_fin - pd.Timedelta(days=1) if corta_fin else p_fin
+        )
+
+        # Extremos cortados por el rango: solo con los días seleccionados
+        partes = [interior]
+        if corta_inicio:
+            partes.insert(0, agregar(self.diario.rango(ini, fin_periodo(p_ini, granularidad)), granularidad))
+        if corta_fin:
+            partes.append(agregar(self.diario.rango(p_fin, fin), granularidad))
+
+        if len(partes) == 1:
+            return interior
+        return pd.concat(partes, ignore_index=True)
+
+
+def fin_periodo(inicio, granularidad):
+    """Último día del periodo que empieza en ``inicio``"""
+    if granularidad == "Semana":
+        return inicio + pd.Timedelta(days=6)
+    if granularidad == "Mes":
+        return inicio + pd.offsets.MonthEnd(0)
+    return inicio
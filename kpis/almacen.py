@@ -0,0 +1,290 @@
+"""
+Almacén columnar de KPIs diarios particionado por fecha (Parquet/Arrow).
+
+Cada mes se guarda en su propia partición ``anio=YYYY/mes=M`` para que una
+lectura con ``fecha_inicio``/``fecha_fin`` abra solo los ficheros del rango
+y solo las columnas que necesita la vista. Las tablas que se actualizan
+con frecuencia (intervalos cargados por el ETL) pueden particionarse por
+día (``.../dia=D``) para que un upsert reescriba solo los días tocados.
+"""
+
+import os
+import shutil
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from kpis.dimensiones import categorizar
+from kpis.serie import fin_exclusivo
+
+# Ruta por defecto del almacén (configurable con ASISA_ALMACEN)
+RUTA_ALMACEN = Path(os.environ.get(
+    "ASISA_ALMACEN",
+    Path(__file__).resolve().parent.parent / "datos" / "kpis"
+))
+
+
+def _sin_categorias(df):
+    """Dimensiones como texto para poder concatenar tablas con categorías distintas"""
+    return df.astype({c: str for c in df.columns
+                      if isinstance(df[c].dtype, pd.CategoricalDtype)})
+
+
+# Columnas de partición por nivel ("mes" o "dia")
+NIVELES_PARTICION = {
+    "mes": [("anio", pa.int16()), ("mes", pa.int8())],
+    "dia": [("anio", pa.int16()), ("mes", pa.int8()), ("dia", pa.int8())],
+}
+
+
+def _partes_fecha(fecha, n):
+    fecha = pd.Timestamp(fecha)
+    return (fecha.year, fecha.month, fecha.day)[:n]
+
+
+def _comparar(campos, valores, operador):
+    """Comparación lexicográfica (anio, mes[, dia]) <op> valores"""
+    cond = operador(campos[-1], valores[-1])
+    for campo, valor in zip(reversed(campos[:-1]), reversed(valores[:-1])):
+        estricto = (campo > valor) if operador(1, 0) else (campo < valor)
+        cond = estricto | ((campo == valor) & cond)
+    return cond
+
+
+def _filtro_particiones(fecha_inicio, fecha_fin, particion="mes"):
+    """Expresión sobre las columnas de partición que descarta las de fuera del rango"""
+    campos = [ds.field(nombre) for nombre, _ in NIVELES_PARTICION[particion]]
+    filtro = pc.scalar(True)
+
+    if fecha_inicio is not None:
+        filtro &= _comparar(campos, _partes_fecha(fecha_inicio, len(campos)),
+                            lambda a, b: a >= b)
+
+    if fecha_fin is not None:
+        filtro &= _comparar(campos, _partes_fecha(fecha_fin, len(campos)),
+                            lambda a, b: a <= b)
+
+    return filtro
+
+
+def _filtro_lista_particiones(valores, particion="mes"):
+    """
+    Expresión que deja solo las particiones de ``valores`` (tuplas
+    ``(anio, mes[, dia])``): un término por partición padre con ``isin``
+    sobre el último nivel, así que sigue siendo corta con muchos días.
+    """
+    campos = [ds.field(nombre) for nombre, _ in NIVELES_PARTICION[particion]]
+    hijos = {}
+    for tupla in valores:
+        hijos.setdefault(tuple(tupla[:-1]), set()).add(tupla[-1])
+
+    filtro = pc.scalar(False)
+    for padre, ultimos in hijos.items():
+        termino = campos[-1].isin(sorted(ultimos))
+        for campo, valor in zip(campos, padre):
+            termino &= campo == valor
+        filtro |= termino
+    return filtro
+
+
+class AlmacenKPI:
+    """Tabla de KPIs guardada como dataset Parquet particionado por mes (o día)"""
+
+    def __init__(self, ruta=RUTA_ALMACEN, particion="mes"):
+        self.ruta = Path(ruta)
+        self.particion = particion
+        self._niveles = [nombre for nombre, _ in NIVELES_PARTICION[particion]]
+        self._particionado = ds.partitioning(
+            pa.schema(NIVELES_PARTICION[particion]), flavor="hive"
+        )
+
+    def existe(self):
+        patron = "/".join(f"{nivel}=*" for nivel in self._niveles) + "/*.parquet"
+        return self.ruta.is_dir() and any(self.ruta.glob(patron))
+
+    def vaciar(self):
+        """Borra todas las particiones (las dimensiones se conservan)"""
+        if self.ruta.is_dir():
+            for hijo in self.ruta.glob("anio=*"):
+                shutil.rmtree(hijo)
+        self._nueva_version()
+
+    def _columnas_particion(self, fechas):
+        fechas = pd.to_datetime(fechas)
+        valores = {"anio": fechas.dt.year, "mes": fechas.dt.month, "dia": fechas.dt.day}
+        return {nombre: valores[nombre].astype(tipo.to_pandas_dtype())
+                for nombre, tipo in NIVELES_PARTICION[self.particion]}
+
+    def particiones(self, fechas):
+        """Particiones ``(anio, mes[, dia])`` que contienen ``fechas``"""
+        columnas = pd.DataFrame(self._columnas_particion(pd.Series(fechas)))
+        return sorted(columnas.drop_duplicates().itertuples(index=False, name=None))
+
+    def escribir(self, df):
+        """Escribe ``df`` reemplazando las particiones (meses o días) que contiene"""
+        # Las dimensiones categóricas se guardan codificadas con diccionario
+        tabla = pa.Table.from_pandas(
+            df.assign(**self._columnas_particion(df["fecha"])),
+            preserve_index=False
+        )
+        ds.write_dataset(
+            tabla,
+            self.ruta,
+            format="parquet",
+            partitioning=self._particionado,
+            existing_data_behavior="delete_matching"
+        )
+        self._nueva_version()
+
+    def _existente(self, df):
+        """Filas guardadas de las particiones que contiene ``df`` (None si no hay almacén)"""
+        if not self.existe():
+            return None
+        # Particiones completas, solo las que se van a reescribir
+        existente = _sin_categorias(self.leer(particiones=self.particiones(df["fecha"])))
+        return existente.drop(columns=self._niveles)
+
+    def completar(self, df, claves=("fecha", "agente_id"), existente=None):
+        """
+        ``df`` con sus NaN rellenos con el valor guardado de la misma clave:
+        las filas tal como quedarán tras ``actualizar(df, parcial=True)``.
+        """
+        if df.empty:
+            return df
+        if existente is None:
+            existente = self._existente(df)
+        if existente is None or existente.empty:
+            return df
+        claves = list(claves)
+        nuevos = _sin_categorias(df).set_index(claves)
+        viejos = existente.set_index(claves)
+        comunes = nuevos.index.intersection(viejos.index)
+        nuevos = nuevos.fillna(viejos.loc[comunes].reindex(columns=nuevos.columns))
+        return nuevos.reset_index()[list(df.columns)]
+
+    def actualizar(self, df, claves=("fecha", "agente_id"), parcial=False):
+        """
+        Upsert idempotente de ``df`` por ``claves``.
+
+        Solo se leen y reescriben las particiones que contiene ``df``. Con
+        ``parcial=True`` los NaN de ``df`` significan "sin cambios": se
+        conserva el valor existente (cargas en las que cada fuente aporta
+        solo algunas columnas). Devuelve las filas de ``df`` aplicadas.
+        """
+        if df.empty:
+            return 0
+        claves = list(claves)
+        df = _sin_categorias(df)
+
+        existente = self._existente(df)
+        if parcial:
+            df = self.completar(df, claves, existente)
+
+        nuevos = df.set_index(claves)
+        if existente is not None and not existente.empty:
+            viejos = existente.set_index(claves)
+            resultado = pd.concat([viejos.drop(nuevos.index, errors="ignore"), nuevos])
+            tipos = existente.dtypes.drop(claves, errors="ignore")
+        else:
+            resultado = nuevos
+            tipos = df.dtypes.drop(claves, errors="ignore")
+
+        resultado = resultado.reset_index()
+        numericas = [c for c in resultado.columns
+                     if c not in claves and pd.api.types.is_numeric_dtype(resultado[c])]
+        resultado[numericas] = resultado[numericas].fillna(0)
+        resultado = resultado.astype({c: t for c, t in tipos.items() if c in resultado})
+        self.escribir(categorizar(resultado.sort_values(claves, ignore_index=True)))
+        return len(df)
+
+    def escribir_dimension(self, nombre, df):
+        """Guarda una tabla de dimensión pequeña (p. ej. el catálogo de agentes)"""
+        ruta = self.ruta / "_dimensiones"
+        ruta.mkdir(parents=True, exist_ok=True)
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False),
+                       ruta / f"{nombre}.parquet")
+        self._nueva_version()
+
+    def _nueva_version(self):
+        self.ruta.mkdir(parents=True, exist_ok=True)
+        (self.ruta / "_version").write_text(str(time.time_ns()))
+
+    def version(self):
+        """Token que cambia con cada escritura (invalida cachés de consultas)"""
+        try:
+            return (self.ruta / "_version").read_text()
+        except FileNotFoundError:
+            return "0"
+
+    def leer_dimension(self, nombre):
+        return pq.read_table(self.ruta / "_dimensiones" / f"{nombre}.parquet").to_pandas()
+
+    def _dataset(self):
+        # Los directorios que empiezan por "_" (dimensiones) no son particiones
+        return ds.dataset(self.ruta, format="parquet", partitioning=self._particionado)
+
+    def primera_fecha(self):
+        """Fecha más antigua guardada (None si está vacío); solo se lee la primera partición"""
+        fragmentos = list(self._dataset().get_fragments())
+        if not fragmentos:
+            return None
+        primera = min(
+            tuple(ds.get_partition_keys(f.partition_expression)[nivel] for nivel in self._niveles)
+            for f in fragmentos
+        )
+        fechas = self.leer_tabla(columnas=["fecha"], particiones=[primera])["fecha"]
+        return pd.Timestamp(pc.min(fechas).as_py())
+
+    def columnas(self):
+        return [c for c in self._dataset().schema.names if c not in self._niveles]
+
+    def leer_tabla(self, fecha_inicio=None, fecha_fin=None, columnas=None, filtros=None,
+                   particiones=None):
+        """
+        Lee el rango [fecha_inicio, fecha_fin] como tabla Arrow.
+
+        El filtro sobre anio/mes poda particiones enteras (con
+        ``particiones``, lista de ``(anio, mes[, dia])``, solo se abren
+        esas); el filtro sobre ``fecha`` y los de ``filtros`` (dict columna
+        -> valor o lista de valores, ``None`` no filtra) se empujan al
+        lector Parquet.
+        """
+        dataset = self._dataset()
+        tipo_fecha = dataset.schema.field("fecha").type
+
+        filtro = _filtro_particiones(fecha_inicio, fecha_fin, self.particion)
+        if particiones is not None:
+            filtro = filtro & _filtro_lista_particiones(particiones, self.particion)
+        if fecha_inicio is not None:
+            ini = pa.scalar(pd.Timestamp(fecha_inicio), type=tipo_fecha)
+            filtro = filtro & (ds.field("fecha") >= ini)
+        if fecha_fin is not None:
+            fin = pa.scalar(fin_exclusivo(fecha_fin), type=tipo_fecha)
+            filtro = filtro & (ds.field("fecha") < fin)
+        for columna, valor in (filtros or {}).items():
+            if isinstance(valor, (list, tuple, set)):
+                filtro = filtro & ds.field(columna).isin(list(valor))
+            elif valor is not None:
+                filtro = filtro & (ds.field(columna) == valor)
+
+        if columnas is not None and "fecha" not in columnas:
+            columnas = ["fecha"] + list(columnas)
+
+        tabla = dataset.to_table(columns=columnas, filter=filtro)
+        return tabla.take(pc.sort_indices(tabla, sort_keys=[("fecha", "ascending")]))
+
+    def leer(self, fecha_inicio=None, fecha_fin=None, columnas=None, filtros=None, particiones=None):
+        """
+        Igual que ``leer_tabla`` pero devuelve un DataFrame ordenado por fecha.
+
+        Las columnas numéricas se convierten sin copia (un bloque por columna
+        sobre los buffers de Arrow) y quedan de solo lectura: el DataFrame se
+        puede compartir entre sesiones sin riesgo de que alguien lo modifique.
+        """
+        tabla = self.leer_tabla(fecha_inicio, fecha_fin, columnas, filtros, particiones)
+        return tabla.to_pandas(split_blocks=True, self_destruct=True)
@@ -0,0 +1,98 @@
+"""
+Caché de resultados de consultas por tupla de filtros.
+
+Compartida entre todas las sesiones del proceso: expulsión LRU bajo un
+presupuesto de memoria, caducidad por TTL e invalidación por versión de
+datos (cada carga del ETL cambia la versión del almacén y las entradas
+anteriores dejan de servirse).
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def tamano_bytes(objeto):
+    """Estimación de la memoria que ocupa un resultado cacheado"""
+    if isinstance(objeto, (pd.DataFrame, pd.Series)):
+        uso = objeto.memory_usage(deep=True)
+        return int(uso.sum() if isinstance(objeto, pd.DataFrame) else uso)
+    if isinstance(objeto, np.ndarray):
+        return objeto.nbytes
+    if isinstance(objeto, dict):
+        return sys.getsizeof(objeto) + sum(tamano_bytes(k) + tamano_bytes(v) for k, v in objeto.items())
+    if isinstance(objeto, (list, tuple, set)):
+        return sys.getsizeof(objeto) + sum(tamano_bytes(v) for v in objeto)
+    if hasattr(objeto, '__dict__'):
+        return sys.getsizeof(objeto) + tamano_bytes(vars(objeto))
+    return sys.getsizeof(objeto)
+
+
+class CacheConsultas:
+    """LRU con TTL y presupuesto de memoria, indexada por (versión, clave)"""
+
+    def __init__(self, presupuesto_mb=256, ttl=300):
+        self.presupuesto = int(presupuesto_mb * 1024 * 1024)
+        self.ttl = ttl
+        self._entradas = OrderedDict()  # clave -> (caduca, bytes, valor)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.aciertos = self.fallos = self.expulsiones = 0
+
+    def obtener(self, clave, calcular, version=None):
+        """
+        Devuelve el resultado cacheado para ``clave`` o lo calcula con
+        ``calcular()``. ``version`` es el token de datos vigente.
+        """
+        clave = (version, clave)
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None and entrada[0] > ahora:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return entrada[2]
+            if entrada is not None:
+                self._quitar(clave)
+            self.fallos += 1
+
+        # El cálculo se hace fuera del lock para no bloquear otras sesiones
+        valor = calcular()
+        tamano = tamano_bytes(valor)
+        if tamano > self.presupuesto:
+            return valor
+
+        with self._lock:
+            if clave in self._entradas:
+                self._quitar(clave)
+            self._entradas[clave] = (time.monotonic() + self.ttl, tamano, valor)
+            self._bytes += tamano
+            while self._bytes > self.presupuesto:
+                self._quitar(next(iter(self._entradas)))
+                self.expulsiones += 1
+        return valor
+
+    def _quitar(self, clave):
+        _, tamano, _ = self._entradas.pop(clave)
+        self._bytes -= tamano
+
+    def invalidar(self, version_vigente=None):
+        """Borra todo, o solo las entradas de versiones distintas a la vigente"""
+        with self._lock:
+            for clave in list(self._entradas):
+                if version_vigente is None or clave[0] != version_vigente:
+                    self._quitar(clave)
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'entradas': len(self._entradas),
+                'memoria_mb': self._bytes / (1024 * 1024),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'expulsiones': self.expulsiones,
+            }
@@ -0,0 +1,33 @@
+"""
+KPIs como cocientes de componentes aditivos (estadísticos suficientes).
+
+Cada KPI ratio se guarda como numerador/denominador. Los agregados de
+cualquier nivel (día → semana → mes, agente → vertical) se combinan sumando
+componentes y el KPI se recalcula al final como cociente de sumas, que es
+exacto aunque los volúmenes varíen (la media de porcentajes diarios no lo es).
+"""
+
+import pandas as pd
+
+from kpis.registro import REGISTRO
+
+# Componentes aditivos de los KPIs (declarados en el registro)
+COMPONENTES = REGISTRO.componentes()
+
+
+def derivar_kpis(df):
+    """Añade (o recalcula) las columnas de KPIs derivados a partir de los componentes"""
+    return df.assign(**REGISTRO.evaluar(df))
+
+
+def combinar(tablas, claves=('fecha',)):
+    """
+    Combina agregados sumando sus componentes por ``claves``.
+
+    Sirve igual para juntar particiones o resultados de varios procesos
+    (mismas claves) que para subir de nivel (p. ej. quitar ``agente_id``).
+    """
+    tablas = list(tablas)
+    df = pd.concat(tablas, ignore_index=True) if len(tablas) > 1 else tablas[0]
+    sumas = df.groupby(list(claves), sort=True, observed=True)[COMPONENTES].sum()
+    return derivar_kpis(sumas.reset_index())
@@ -0,0 +1,89 @@
+"""
+Índices por dimensión (vertical, agente) para los filtros del sidebar.
+
+Las dimensiones se guardan como columnas categóricas (codificadas con
+diccionario). Para cada valor se precalcula la lista ordenada de filas que
+lo contienen, de modo que un filtro combinado (vertical × agente × rango de
+fechas) se resuelve intersecando listas de enteros, sin comparar cadenas.
+"""
+
+import numpy as np
+import pandas as pd
+
+DIMENSIONES = ('vertical', 'agente_id')
+
+# Valor de los selectores que significa "sin filtro"
+TODOS = "Todos"
+
+_VACIO = np.empty(0, dtype=np.int64)
+
+
+def categorizar(df, dimensiones=DIMENSIONES):
+    """Convierte las dimensiones presentes en ``df`` a columnas categóricas"""
+    return df.astype({d: 'category' for d in dimensiones
+                      if d in df.columns and not isinstance(df[d].dtype, pd.CategoricalDtype)})
+
+
+def _interseccion(a, b):
+    """Intersección de dos arrays de posiciones ordenados (búsqueda binaria)"""
+    if len(a) > len(b):
+        a, b = b, a
+    if not len(a) or not len(b):
+        return _VACIO
+    pos = np.searchsorted(b, a)
+    pos[pos == len(b)] = len(b) - 1
+    return a[b[pos] == a]
+
+
+class IndiceDimensiones:
+    """Lista de filas (ordenada) por cada valor de cada dimensión"""
+
+    def __init__(self, df, dimensiones=DIMENSIONES):
+        self.n_filas = len(df)
+        self._posiciones = {}
+        for dim in dimensiones:
+            columna = df[dim]
+            if not isinstance(columna.dtype, pd.CategoricalDtype):
+                columna = columna.astype('category')
+            codigos = columna.cat.codes.to_numpy()
+            categorias = columna.cat.categories
+
+            # Orden estable por código: las filas de cada valor quedan
+            # contiguas y en orden ascendente (los nulos, código -1, primero)
+            orden = np.argsort(codigos, kind='stable')
+            validos = codigos[codigos >= 0]
+            cortes = len(codigos) - len(validos) + np.concatenate(
+                [[0], np.cumsum(np.bincount(validos, minlength=len(categorias)))]
+            )
+            self._posiciones[dim] = {
+                valor: orden[cortes[k]:cortes[k + 1]]
+                for k, valor in enumerate(categorias)
+            }
+
+    def valores(self, dimension):
+        return list(self._posiciones[dimension])
+
+    def filas(self, filtros, inicio=0, fin=None):
+        """
+        Posiciones de las filas que cumplen ``filtros`` dentro de [inicio, fin).
+
+        ``filtros`` es un dict dimensión -> valor; ``None`` o ``TODOS`` no
+        filtran. El rango [inicio, fin) suele venir de
+        ``SerieTemporal.indices`` sobre los mismos datos.
+        """
+        fin = self.n_filas if fin is None else fin
+        listas = [
+            self._posiciones[dim].get(valor, _VACIO)
+            for dim, valor in filtros.items()
+            if valor is not None and valor != TODOS
+        ]
+        if not listas:
+            return np.arange(inicio, fin)
+
+        # Se empieza por la lista más corta para que las intersecciones sean baratas
+        listas.sort(key=len)
+        filas = listas[0]
+        filas = filas[np.searchsorted(filas, inicio):np.searchsorted(filas, fin)]
+        for lista in listas[1:]:
+            filas = _interseccion(filas, lista)
+        return filas
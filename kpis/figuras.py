@@ -0,0 +1,39 @@
+"""
+Caché de figuras Plotly serializadas.
+
+Construir una figura con ``plotly.express`` (y volver a serializarla)
+cuesta decenas de milisegundos aunque los datos sean los mismos. Se guarda
+el JSON de cada figura por ``(gráfico, tupla de filtros)`` y versión de
+datos en una ``CacheConsultas`` propia (LRU bajo presupuesto de memoria,
+TTL y contadores de aciertos/fallos): la misma vista pedida por distintos
+usuarios se construye una sola vez.
+"""
+
+import json
+
+import plotly.graph_objects as go
+
+from kpis.cache import CacheConsultas
+
+
+class CacheFiguras:
+    """JSON de figuras por (gráfico, filtros, versión de datos)"""
+
+    def __init__(self, presupuesto_mb=64, ttl=300):
+        self._cache = CacheConsultas(presupuesto_mb=presupuesto_mb, ttl=ttl)
+
+    def obtener(self, grafico, filtros, construir, version=None):
+        """
+        Figura de ``grafico`` para ``filtros`` (tupla hashable). Si no está
+        cacheada se construye con ``construir()`` y se guarda su JSON.
+        """
+        spec = self._cache.obtener((grafico, filtros), lambda: construir().to_json(), version=version)
+        # El JSON viene de una figura ya validada: se reconstruye sin volver
+        # a validar cada traza (es lo que cuesta en Figure(**dict))
+        return go.Figure(json.loads(spec), _validate=False)
+
+    def invalidar(self, version_vigente=None):
+        self._cache.invalidar(version_vigente)
+
+    def estadisticas(self):
+        return self._cache.estadisticas()
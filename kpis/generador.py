@@ -0,0 +1,194 @@
+"""
+Generador sintético, determinista y vectorizado de datos del call center.
+
+Produce filas por intervalo (15/30 min) y agente con conteos coherentes
+(en umbral <= atendidas <= ofrecidas, pólizas <= presupuestos) y
+estacionalidad anual, semanal e intradía. Cada mes se genera con su propia
+semilla derivada de ``(semilla, año, mes)``, así que el resultado no depende
+de cómo se trocee la generación ni de qué proceso la haga.
+
+Uso:
+    python -m kpis.generador --agentes 200 --desde 2021-01-01 --hasta 2025-12-31 \\
+        --intervalo 15min --grano dia --destino datos/kpis
+"""
+
+import argparse
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from kpis.agregados import a_diario
+from kpis.dimensiones import categorizar
+
+VERTICALES = ['Venta', 'Retención', 'Venta (Outbound)', 'Venta (Inbound)']
+
+NOMBRES = ['Juan', 'María', 'Carlos', 'Ana', 'Luis', 'Laura', 'Javier', 'Carmen',
+           'Miguel', 'Lucía', 'David', 'Elena', 'Pablo', 'Sara', 'Sergio', 'Marta',
+           'Diego', 'Paula', 'Raúl', 'Irene']
+APELLIDOS = ['Pérez', 'García', 'López', 'Martínez', 'Rodríguez', 'Sánchez', 'Gómez',
+             'Díaz', 'Fernández', 'Moreno', 'Jiménez', 'Ruiz', 'Hernández', 'Muñoz',
+             'Álvarez', 'Romero', 'Navarro', 'Torres', 'Domínguez', 'Vázquez']
+
+# Horario de atención por día de la semana (lunes=0): (hora apertura, hora cierre)
+HORARIO = {0: (8, 22), 1: (8, 22), 2: (8, 22), 3: (8, 22), 4: (8, 22), 5: (9, 15)}
+
+# Llamadas ofrecidas por agente y hora en una hora media
+LLAMADAS_HORA = 3.0
+
+# Probabilidad de presupuesto por llamada atendida y de venta por presupuesto
+PROB_PRESUPUESTO = {'Venta': 0.20, 'Retención': 0.08,
+                    'Venta (Outbound)': 0.25, 'Venta (Inbound)': 0.18}
+PROB_VENTA = {'Venta': 0.30, 'Retención': 0.45,
+              'Venta (Outbound)': 0.22, 'Venta (Inbound)': 0.35}
+
+# Multiplicador de volumen por mes (enero y septiembre altos, agosto bajo)
+ESTACIONALIDAD_MES = np.array([1.15, 1.05, 1.0, 0.95, 1.0, 0.95,
+                               0.85, 0.70, 1.15, 1.05, 1.0, 0.90])
+
+
+def generar_agentes(n_agentes, verticales=VERTICALES, semilla=0):
+    """Catálogo de agentes (agente_id, nombre, vertical) repartidos por vertical"""
+    rng = np.random.default_rng([semilla, 0])
+    nombres = [f"{n} {a}" for n, a in itertools.product(NOMBRES, APELLIDOS)]
+    elegidos = rng.permutation(len(nombres))[np.arange(n_agentes) % len(nombres)]
+    return pd.DataFrame({
+        'agente_id': [f"AG{i + 1:04d}" for i in range(n_agentes)],
+        'nombre': [nombres[k] for k in elegidos],
+        'vertical': [verticales[i % len(verticales)] for i in range(n_agentes)],
+    })
+
+
+def _curva_intradia(horas):
+    """Forma de la demanda en el día: picos a media mañana y primera tarde"""
+    return (0.4
+            + 1.0 * np.exp(-0.5 * ((horas - 10.0) / 1.3) ** 2)
+            + 0.7 * np.exp(-0.5 * ((horas - 16.5) / 1.5) ** 2))
+
+
+def _instantes(mes, intervalo):
+    """Inicios de intervalo dentro del horario de atención del mes"""
+    instantes = pd.date_range(mes, mes + pd.offsets.MonthEnd(0) + pd.Timedelta(days=1),
+                              freq=intervalo, inclusive='left')
+    dia_semana = instantes.dayofweek.to_numpy()
+    horas = (instantes.hour + instantes.minute / 60).to_numpy()
+    apertura = np.array([HORARIO.get(d, (0, 0))[0] for d in range(7)])[dia_semana]
+    cierre = np.array([HORARIO.get(d, (0, 0))[1] for d in range(7)])[dia_semana]
+    abierto = (horas >= apertura) & (horas < cierre)
+    return instantes[abierto], horas[abierto]
+
+
+def generar_mes(mes, agentes, intervalo='30min', semilla=0):
+    """Filas por intervalo y agente de un mes (``mes`` = cualquier día del mes)"""
+    mes = pd.Timestamp(mes).to_period('M').start_time
+    rng = np.random.default_rng([semilla, mes.year, mes.month])
+    instantes, horas = _instantes(mes, intervalo)
+    n_int, n_ag = len(instantes), len(agentes)
+    n = n_int * n_ag
+
+    # Demanda esperada: base por agente × forma intradía × estacionalidad
+    # × un factor diario común (días buenos/malos) × productividad del agente
+    fraccion_hora = pd.Timedelta(intervalo) / pd.Timedelta(hours=1)
+    dias = (instantes.normalize() - mes).days.to_numpy()
+    factor_dia = rng.lognormal(0.0, 0.15, dias.max() + 1 if n_int else 1)[dias]
+    factor_agente = rng.lognormal(0.0, 0.2, n_ag)
+    lam_int = LLAMADAS_HORA * fraccion_hora * _curva_intradia(horas) \
+        * ESTACIONALIDAD_MES[mes.month - 1] * factor_dia
+    lam = np.outer(lam_int, factor_agente).ravel()
+
+    # Carga relativa del intervalo: con más carga baja el nivel de servicio
+    carga = np.repeat(lam_int / lam_int.mean() if n_int else lam_int, n_ag)
+    p_atendida = np.clip(0.985 - 0.05 * (carga - 1), 0.80, 0.995)
+    p_umbral = np.clip(rng.normal(0.92, 0.02, n) - 0.10 * (carga - 1), 0.50, 0.995)
+
+    ofrecidas = rng.poisson(lam)
+    atendidas = rng.binomial(ofrecidas, p_atendida)
+    en_umbral = rng.binomial(atendidas, p_umbral)
+
+    # Tiempos: suma de ``atendidas`` exponenciales = Gamma(atendidas, media)
+    tmo_agente = np.repeat(rng.uniform(3.5, 7.0, (1, n_ag)), n_int, axis=0).ravel()
+    minutos_tmo = rng.gamma(np.maximum(atendidas, 1), tmo_agente) * (atendidas > 0)
+    minutos_tma = rng.gamma(np.maximum(atendidas, 1), 1.8) * (atendidas > 0)
+
+    vertical_agente = agentes['vertical'].to_numpy()
+    p_pres = np.tile(pd.Series(vertical_agente).map(PROB_PRESUPUESTO).to_numpy(), n_int)
+    p_venta = np.tile(pd.Series(vertical_agente).map(PROB_VENTA).to_numpy(), n_int)
+    presupuestos = rng.binomial(atendidas, p_pres)
+    polizas = rng.binomial(presupuestos, p_venta)
+
+    df = pd.DataFrame({
+        'fecha': np.repeat(instantes.to_numpy(), n_ag),
+        'vertical': np.tile(vertical_agente, n_int),
+        'agente_id': np.tile(agentes['agente_id'].to_numpy(), n_int),
+        'llamadas_totales': ofrecidas,
+        'llamadas_atendidas': atendidas,
+        'llamadas_en_umbral': en_umbral,
+        'llamadas_abandonadas': ofrecidas - atendidas,
+        'minutos_tmo': minutos_tmo,
+        'minutos_tma': minutos_tma,
+        'presupuestos': presupuestos,
+        'polizas_vendidas': polizas,
+    })
+    return categorizar(df)
+
+
+def generar(fecha_inicio, fecha_fin, agentes, intervalo='30min', grano='intervalo', semilla=0):
+    """
+    Genera mes a mes entre ``fecha_inicio`` y ``fecha_fin`` (inclusive).
+
+    Devuelve un iterador de DataFrames (uno por mes) para que volúmenes
+    grandes no tengan que caber en memoria a la vez.
+    """
+    ini, fin = pd.Timestamp(fecha_inicio), pd.Timestamp(fecha_fin)
+    for mes in pd.period_range(ini, fin, freq='M'):
+        df = generar_mes(mes.start_time, agentes, intervalo, semilla)
+        df = df[(df['fecha'] >= ini.normalize()) & (df['fecha'] < fin.normalize() + pd.Timedelta(days=1))]
+        yield a_diario(df) if grano == 'dia' else df.reset_index(drop=True)
+
+
+def escribir_en_almacen(almacen, fecha_inicio, fecha_fin, agentes, intervalo='30min',
+                        grano='dia', semilla=0, almacen_intervalos=None):
+    """
+    Genera y escribe mes a mes en ``almacen``; devuelve las filas escritas.
+
+    Con ``almacen_intervalos`` las filas por intervalo del mismo mes se
+    guardan también ahí (``almacen`` recibe entonces el grano diario).
+    """
+    almacen.escribir_dimension('agentes', agentes)
+    if almacen_intervalos is not None:
+        almacen_intervalos.escribir_dimension('agentes', agentes)
+        grano_generado = 'intervalo'
+    else:
+        grano_generado = grano
+
+    filas = 0
+    for df in generar(fecha_inicio, fecha_fin, agentes, intervalo, grano_generado, semilla):
+        if almacen_intervalos is not None:
+            almacen_intervalos.escribir(df)
+            df = a_diario(df)
+        almacen.escribir(df)
+        filas += len(df)
+    return filas
+
+
+def main():
+    from kpis.almacen import RUTA_ALMACEN, AlmacenKPI
+
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos del call center")
+    parser.add_argument('--agentes', type=int, default=200)
+    parser.add_argument('--desde', default='2024-01-01')
+    parser.add_argument('--hasta', default='2024-12-31')
+    parser.add_argument('--intervalo', default='30min', choices=['15min', '30min'])
+    parser.add_argument('--grano', default='dia', choices=['dia', 'intervalo'])
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--destino', default=str(RUTA_ALMACEN))
+    args = parser.parse_args()
+
+    agentes = generar_agentes(args.agentes, semilla=args.semilla)
+    filas = escribir_en_almacen(AlmacenKPI(args.destino), args.desde, args.hasta, agentes,
+                                args.intervalo, args.grano, args.semilla)
+    print(f"✅ {filas:,} filas escritas en {args.destino}")
+
+
+if __name__ == '__main__':
+    main()
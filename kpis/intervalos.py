@@ -0,0 +1,30 @@
+"""
+Tabla de hechos por intervalo (15/30 min) y perfil intradía.
+
+Cada fila es un intervalo × agente con los componentes aditivos (ofrecidas,
+atendidas, en umbral, abandonadas, minutos de operación...). Los agregados
+diario/semanal/mensual se mantienen desde esta tabla con ``etl.rollups``,
+recalculando solo las celdas que toca cada lote.
+"""
+
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from kpis.almacen import RUTA_ALMACEN
+from kpis.componentes import COMPONENTES, combinar
+from kpis.dimensiones import DIMENSIONES
+
+# Almacén de intervalos, junto al diario (configurable con ASISA_INTERVALOS)
+RUTA_INTERVALOS = Path(os.environ.get("ASISA_INTERVALOS", RUTA_ALMACEN.parent / "intervalos"))
+
+COLUMNAS_INTERVALO = ['fecha', *DIMENSIONES, *COMPONENTES]
+
+
+def perfil_intradia(df):
+    """KPIs por franja horaria (hora:minuto del inicio del intervalo)"""
+    minutos = df['fecha'].dt.hour * 60 + df['fecha'].dt.minute
+    perfil = combinar([df.assign(minuto=minutos)], claves=('minuto',))
+    franja = pd.to_timedelta(perfil['minuto'], unit='min')
+    return perfil.assign(franja=(pd.Timestamp(0) + franja).dt.strftime('%H:%M'))
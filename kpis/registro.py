@@ -0,0 +1,164 @@
+"""
+Registro declarativo de KPIs.
+
+Cada métrica se declara una sola vez: sus entradas, su fórmula (expresión
+NumPy sobre arrays completos), su regla de agregación y, si lo tiene, su
+objetivo. El motor ordena las métricas derivadas según sus dependencias y
+las evalúa todas en bloque sobre una tabla (una vez por carga de datos o
+lote del ETL); gráficos y tarjetas solo leen columnas ya calculadas.
+
+Reglas de agregación:
+    'suma'  componente aditivo; al agregar se suma.
+    'ratio' métrica derivada; al agregar NO se promedia, se vuelve a
+            evaluar su fórmula sobre los componentes ya sumados.
+"""
+
+import numpy as np
+
+
+def cociente(numerador, denominador, escala=1.0):
+    """``escala * numerador / denominador`` con NaN donde el denominador es 0"""
+    numerador = np.asarray(numerador, dtype=np.float64)
+    denominador = np.asarray(denominador, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        resultado = np.where(denominador == 0, np.nan, escala * numerador / denominador)
+    return resultado if resultado.ndim else float(resultado)
+
+
+class KPI:
+    """Declaración de una métrica del registro"""
+
+    def __init__(self, nombre, etiqueta, agregacion='ratio', entradas=(), formula=None,
+                 unidad='', objetivo=None, mayor_es_mejor=True):
+        if agregacion not in ('suma', 'ratio'):
+            raise ValueError(f"Regla de agregación no soportada: {agregacion}")
+        if agregacion == 'ratio' and formula is None:
+            raise ValueError(f"El KPI derivado '{nombre}' necesita una fórmula")
+        self.nombre = nombre
+        self.etiqueta = etiqueta
+        self.agregacion = agregacion
+        self.entradas = tuple(entradas)
+        self.formula = formula
+        self.unidad = unidad
+        self.objetivo = objetivo
+        self.mayor_es_mejor = mayor_es_mejor
+
+    def __repr__(self):
+        return f"KPI({self.nombre!r}, agregacion={self.agregacion!r})"
+
+
+class RegistroKPI:
+    """Conjunto de KPIs con resolución de dependencias y evaluación en bloque"""
+
+    def __init__(self):
+        self._kpis = {}
+        self._orden = None
+
+    def registrar(self, kpi):
+        if kpi.nombre in self._kpis:
+            raise ValueError(f"KPI duplicado: {kpi.nombre}")
+        self._kpis[kpi.nombre] = kpi
+        self._orden = None
+        return kpi
+
+    def __getitem__(self, nombre):
+        return self._kpis[nombre]
+
+    def __contains__(self, nombre):
+        return nombre in self._kpis
+
+    def __iter__(self):
+        return iter(self._kpis.values())
+
+    def componentes(self):
+        """Nombres de los componentes aditivos, en orden de registro"""
+        return [k.nombre for k in self._kpis.values() if k.agregacion == 'suma']
+
+    def derivados(self):
+        """KPIs derivados en orden de evaluación (dependencias primero)"""
+        if self._orden is None:
+            self._orden = self._resolver()
+        return self._orden
+
+    def _resolver(self):
+        orden, estado = [], {}
+
+        def visitar(nombre, camino):
+            if nombre not in self._kpis:
+                raise ValueError(f"'{camino[-1]}' depende de '{nombre}', que no está registrado")
+            if estado.get(nombre) == 'hecho':
+                return
+            if estado.get(nombre) == 'visitando':
+                raise ValueError(f"Dependencia circular: {' -> '.join(camino + [nombre])}")
+            estado[nombre] = 'visitando'
+            for entrada in self._kpis[nombre].entradas:
+                visitar(entrada, camino + [nombre])
+            estado[nombre] = 'hecho'
+            if self._kpis[nombre].agregacion == 'ratio':
+                orden.append(self._kpis[nombre])
+
+        for nombre in self._kpis:
+            visitar(nombre, [])
+        return orden
+
+    def evaluar(self, valores):
+        """
+        Evalúa todos los KPIs derivados sobre ``valores`` (dict o DataFrame
+        con los componentes) y devuelve un dict nombre -> array.
+        """
+        valores = {c: np.asarray(valores[c]) for c in self.componentes()}
+        for kpi in self.derivados():
+            valores[kpi.nombre] = kpi.formula(valores)
+        return {kpi.nombre: valores[kpi.nombre] for kpi in self.derivados()}
+
+
+# ========================================
+# KPIs DEL CALL CENTER
+# ========================================
+REGISTRO = RegistroKPI()
+
+# Componentes aditivos
+for _nombre, _etiqueta in [
+    ('llamadas_totales', 'Llamadas ofrecidas'),
+    ('llamadas_atendidas', 'Llamadas atendidas'),
+    ('llamadas_en_umbral', 'Atendidas dentro del umbral de servicio'),
+    ('llamadas_abandonadas', 'Llamadas abandonadas'),
+    ('minutos_tmo', 'Minutos de operación'),
+    ('minutos_tma', 'Minutos de atención'),
+    ('presupuestos', 'Presupuestos'),
+    ('polizas_vendidas', 'Pólizas vendidas'),
+]:
+    REGISTRO.registrar(KPI(_nombre, _etiqueta, agregacion='suma'))
+
+# KPIs derivados (cocientes de sumas)
+REGISTRO.registrar(KPI(
+    'nivel_servicio', 'Nivel de Servicio', unidad='%', objetivo=90,
+    entradas=('llamadas_en_umbral', 'llamadas_totales'),
+    formula=lambda v: cociente(v['llamadas_en_umbral'], v['llamadas_totales'], 100)
+))
+REGISTRO.registrar(KPI(
+    'tmo', 'TMO', unidad=' min', mayor_es_mejor=False,
+    entradas=('minutos_tmo', 'llamadas_atendidas'),
+    formula=lambda v: cociente(v['minutos_tmo'], v['llamadas_atendidas'])
+))
+REGISTRO.registrar(KPI(
+    'tma', 'TMA', unidad=' min', mayor_es_mejor=False,
+    entradas=('minutos_tma', 'llamadas_atendidas'),
+    formula=lambda v: cociente(v['minutos_tma'], v['llamadas_atendidas'])
+))
+REGISTRO.registrar(KPI(
+    # Mismo denominador que TMO y TMA: se pueden sumar
+    'tmo_tma', 'Tiempo medio total de gestión', unidad=' min', mayor_es_mejor=False,
+    entradas=('tmo', 'tma'),
+    formula=lambda v: v['tmo'] + v['tma']
+))
+REGISTRO.registrar(KPI(
+    'tasa_conversion', 'Tasa Conversión', unidad='%',
+    entradas=('polizas_vendidas', 'presupuestos'),
+    formula=lambda v: cociente(v['polizas_vendidas'], v['presupuestos'], 100)
+))
+REGISTRO.registrar(KPI(
+    'tasa_abandono', 'Tasa de Abandono', unidad='%', mayor_es_mejor=False,
+    entradas=('llamadas_abandonadas', 'llamadas_totales'),
+    formula=lambda v: cociente(v['llamadas_abandonadas'], v['llamadas_totales'], 100)
+))
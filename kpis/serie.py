@@ -0,0 +1,52 @@
+"""
+Serie temporal de KPIs ordenada por fecha.
+
+Los filtros por rango de fechas se resuelven con búsqueda binaria
+(``searchsorted``) sobre la columna ``fecha`` ya ordenada y devuelven un
+corte posicional del DataFrame, sin máscaras booleanas ni copias.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def fin_exclusivo(fecha_fin):
+    """La fecha fin del dashboard es inclusiva: el límite es el día siguiente"""
+    return pd.Timestamp(fecha_fin).normalize() + pd.Timedelta(days=1)
+
+
+class SerieTemporal:
+    """DataFrame ordenado por ``fecha`` con cortes por rango en O(log n)"""
+
+    def __init__(self, df, columna="fecha"):
+        if not df[columna].is_monotonic_increasing:
+            df = df.sort_values(columna, kind="stable", ignore_index=True)
+        self.df = df
+        self.columna = columna
+        self._fechas = df[columna].to_numpy()
+
+    def __len__(self):
+        return len(self.df)
+
+    def _posicion(self, fecha):
+        valor = pd.Timestamp(fecha).to_datetime64().astype(self._fechas.dtype)
+        return int(np.searchsorted(self._fechas, valor, side="left"))
+
+    def indices(self, fecha_inicio=None, fecha_fin=None):
+        """Posiciones [i, j) de las filas dentro de [fecha_inicio, fecha_fin]"""
+        i = 0 if fecha_inicio is None else self._posicion(fecha_inicio)
+        j = len(self._fechas) if fecha_fin is None else self._posicion(fin_exclusivo(fecha_fin))
+        return i, max(i, j)
+
+    def indices_ventanas(self, fechas_inicio, fechas_fin):
+        """Posiciones [i, j) de varias ventanas con una sola búsqueda vectorizada"""
+        inicios = pd.to_datetime(pd.Series(fechas_inicio)).to_numpy(self._fechas.dtype)
+        fines = pd.to_datetime(pd.Series(fechas_fin)).dt.normalize() + pd.Timedelta(days=1)
+        i = np.searchsorted(self._fechas, inicios, side="left")
+        j = np.searchsorted(self._fechas, fines.to_numpy(self._fechas.dtype), side="left")
+        return i, np.maximum(i, j)
+
+    def rango(self, fecha_inicio=None, fecha_fin=None):
+        """Filas entre ``fecha_inicio`` y ``fecha_fin`` (ambas inclusive)"""
+        i, j = self.indices(fecha_inicio, fecha_fin)
+        return self.df.iloc[i:j]
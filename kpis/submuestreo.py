@@ -0,0 +1,86 @@
+"""
+Submuestreo de series temporales largas antes de dibujarlas.
+
+Un gráfico no puede mostrar más puntos que píxeles tiene de ancho: enviar
+cientos de miles de filas solo engorda el JSON y ralentiza el navegador.
+Las series se reducen en el servidor a un presupuesto de puntos:
+
+- líneas: Largest-Triangle-Three-Buckets (LTTB), que conserva la forma de
+  la curva eligiendo en cada cubo el punto que forma el triángulo de mayor
+  área con sus vecinos; además se fuerzan el mínimo y el máximo globales
+  para que las caídas de nivel de servicio no desaparezcan nunca.
+- barras/áreas: mínimo y máximo de cada cubo (los picos y valles se ven
+  igual que con todas las filas).
+"""
+
+import numpy as np
+
+
+def lttb(x, y, umbral):
+    """Índices (ordenados) de los ``umbral`` puntos de ``(x, y)`` que elige LTTB"""
+    n = len(y)
+    if umbral >= n or umbral < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # El primer y el último punto se conservan; el resto se reparte en
+    # umbral - 2 cubos [bordes[i], bordes[i + 1])
+    bordes = np.linspace(1, n - 1, umbral - 1).astype(np.int64)
+    indices = np.empty(umbral, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+
+    anterior = 0
+    for i in range(umbral - 2):
+        inicio, fin = bordes[i], bordes[i + 1]
+        # Tercer vértice: la media del cubo siguiente (o el último punto)
+        siguiente = slice(fin, bordes[i + 2]) if i + 2 < len(bordes) else slice(n - 1, n)
+        cx, cy = x[siguiente].mean(), y[siguiente].mean()
+        ax, ay = x[anterior], y[anterior]
+        areas = np.abs((ax - cx) * (y[inicio:fin] - ay) - (ax - x[inicio:fin]) * (cy - ay))
+        anterior = inicio + int(np.argmax(areas))
+        indices[i + 1] = anterior
+    return indices
+
+
+def min_max(y, umbral):
+    """Índices (ordenados) del mínimo y el máximo de cada uno de ``umbral // 2`` cubos"""
+    n = len(y)
+    if umbral >= n or umbral < 2:
+        return np.arange(n)
+
+    y = np.asarray(y, dtype=np.float64)
+    cubos = umbral // 2
+    inicios = np.linspace(0, n, cubos + 1).astype(np.int64)[:-1]
+    cubo = np.repeat(np.arange(cubos), np.diff(np.append(inicios, n)))
+    # Primera posición de cada cubo donde se alcanza su mínimo (o máximo)
+    minimos = np.flatnonzero(y == np.minimum.reduceat(y, inicios)[cubo])
+    maximos = np.flatnonzero(y == np.maximum.reduceat(y, inicios)[cubo])
+    primeros = [posiciones[np.unique(cubo[posiciones], return_index=True)[1]]
+                for posiciones in (minimos, maximos)]
+    return np.union1d(*primeros)
+
+
+def submuestrear(df, x, y, puntos, metodo="lttb"):
+    """
+    Filas de ``df`` (ordenado por ``x``) reducidas a unos ``puntos`` con
+    ``metodo`` ``"lttb"`` (líneas) o ``"min_max"`` (barras y áreas). Las
+    filas con ``y`` vacío se descartan; si ya caben, ``df`` se devuelve tal cual.
+    """
+    validas = df[df[y].notna()]
+    if len(validas) <= puntos:
+        return df
+
+    valores = validas[y].to_numpy(dtype=np.float64)
+    if metodo == "lttb":
+        ejes = validas[x].to_numpy()
+        if np.issubdtype(ejes.dtype, np.datetime64):
+            # Segundos desde el primer punto: sin pérdida de precisión en las áreas
+            ejes = (ejes - ejes[0]) / np.timedelta64(1, 's')
+        # Dos puntos del presupuesto se reservan para los extremos globales
+        indices = np.union1d(lttb(ejes, valores, puntos - 2), [np.argmin(valores), np.argmax(valores)])
+    elif metodo == "min_max":
+        indices = min_max(valores, puntos)
+    else:
+        raise ValueError(f"Método de submuestreo desconocido: {metodo!r}")
+    return validas.iloc[indices]